@@ -1,15 +1,78 @@
+import os
+
 from pydantic import BaseModel
 
+ENV_PREFIX = "TAXI_"
+
 class Settings(BaseModel):
     model_path: str = "artifacts/rf_model.joblib"
     schema_path: str = "artifacts/feature_schema.json"
+    baseline_path: str = "artifacts/demand_baseline.csv"
+    # "joblib" (sklearn pickle) or "flat" (memory-mapped export dir, e.g. artifacts/rf_model_flat)
+    model_format: str = "joblib"
+
+    # Evaluate the forest from flattened arrays instead of sklearn's predict
+    compiled_inference: bool = False
+
+    # Poll model/schema files and hot-reload on change (0 disables)
+    model_watch_seconds: float = 0
+
+    # Model inference runs off the event loop: "thread" or "process" pool
+    inference_executor: str = "thread"
+    inference_workers: int = 2
+    # Jobs allowed to wait for a worker; beyond that requests get 503
+    inference_queue_depth: int = 16
+
+    # Micro-batch concurrent /predict rows into one model call
+    microbatch_enabled: bool = False
+    microbatch_max_size: int = 32
+    microbatch_max_wait_ms: float = 2.0
+
+    # Memoized /forecast results (0 disables)
+    forecast_cache_entries: int = 256
+
+    # Background rolling forecast for latitude/longitude, served by /forecast and /predict
+    materialize_forecast: bool = False
+    materialize_horizon_hours: int = 168
+    materialize_interval_seconds: int = 3600
+    # How often to check for hour rollover / refreshed weather
+    materialize_poll_seconds: int = 60
+
+    # Per-stage latency histograms on /metrics
+    metrics_enabled: bool = True
 
     # Location for weather forecast (NYC by default)
     latitude: float = 40.7128
     longitude: float = -74.0060
     timezone: str = "America/New_York"
 
+    # Extra forecast zones for /forecast/multi ({"zones": [...]}, see ZoneRegistry);
+    # the location above is always available as zone "default"
+    zones_path: str = "artifacts/zones.json"
+    # Per-zone lag baselines kept in memory (LRU beyond that)
+    zone_baselines_max: int = 64
+
+    # Open-Meteo forecast endpoint (overridable for local stubs)
+    weather_url: str = "https://api.open-meteo.com/v1/forecast"
+
     # Weather cache TTL (seconds)
     weather_cache_ttl: int = 15 * 60
+    # Max days of hourly weather kept across all locations (LRU beyond that)
+    weather_cache_max_days: int = 2048
+
+    # Size of the shared Open-Meteo connection pool
+    weather_max_connections: int = 20
+
+def settings_from_env() -> Settings:
+    """
+    Defaults overridden by TAXI_<FIELD> environment variables,
+    e.g. TAXI_MODEL_FORMAT=flat or TAXI_INFERENCE_WORKERS=4.
+    """
+    overrides = {
+        name: os.environ[ENV_PREFIX + name.upper()]
+        for name in Settings.model_fields
+        if ENV_PREFIX + name.upper() in os.environ
+    }
+    return Settings(**overrides)
 
-settings = Settings()
+settings = settings_from_env()
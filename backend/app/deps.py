@@ -1,11 +1,120 @@
-from app.config import settings
+import asyncio
+from typing import Optional
+
+from app.config import Settings
 from app.services.model_store import ModelStore
 from app.services.weather_open_meteo import WeatherClient
 from app.services.lag_provider import BaselineLagProvider
+from app.services.inference import InferencePool
+from app.services.batcher import MicroBatcher
+from app.services.predictors import ForecastCache
+from app.services.materializer import ForecastMaterializer
+from app.services.metrics import stage_timers
+from app.services.zones import DEFAULT_ZONE, Zone, ZoneRegistry
+
+
+class Services:
+    """Everything the endpoints need; built once per process by the app lifespan."""
+
+    def __init__(
+        self,
+        settings: Settings,
+        model_store: ModelStore,
+        weather_client: WeatherClient,
+        lag_provider: BaselineLagProvider,
+        zones: ZoneRegistry,
+    ):
+        self.settings = settings
+        self.model_store = model_store
+        self.weather_client = weather_client
+        self.lag_provider = lag_provider
+        self.zones = zones
+
+        self.inference_pool = InferencePool(
+            model_store,
+            workers=settings.inference_workers,
+            queue_depth=settings.inference_queue_depth,
+            kind=settings.inference_executor,
+        )
+
+        self.batcher: Optional[MicroBatcher] = None
+        if settings.microbatch_enabled:
+            self.batcher = MicroBatcher(
+                inference=self.inference_pool,
+                max_batch=settings.microbatch_max_size,
+                max_wait_ms=settings.microbatch_max_wait_ms,
+            )
+
+        self.forecast_cache: Optional[ForecastCache] = None
+        if settings.forecast_cache_entries > 0:
+            self.forecast_cache = ForecastCache(settings.forecast_cache_entries)
+
+        self.materializer: Optional[ForecastMaterializer] = None
+        if settings.materialize_forecast:
+            self.materializer = ForecastMaterializer(
+                model_store,
+                weather_client,
+                lag_provider,
+                lat=settings.latitude,
+                lon=settings.longitude,
+                timezone=settings.timezone,
+                horizon_hours=settings.materialize_horizon_hours,
+                interval_seconds=settings.materialize_interval_seconds,
+                poll_seconds=settings.materialize_poll_seconds,
+                inference=self.inference_pool,
+            )
+
+    async def start(self) -> None:
+        await self.weather_client.start()
+        if self.settings.model_watch_seconds > 0:
+            self.model_store.start_watch(
+                self.settings.model_watch_seconds,
+                on_reload=lambda _m: self.inference_pool.reset(),
+            )
+        if self.materializer is not None:
+            self.materializer.start()
+
+    async def stop(self) -> None:
+        if self.materializer is not None:
+            await self.materializer.stop()
+        await self.model_store.stop_watch()
+        self.inference_pool.shutdown()
+        await self.weather_client.aclose()
+
+
+async def build_services(settings: Settings) -> Services:
+    """Load the model and the lag baseline in parallel worker threads, then wire up the rest."""
+    stage_timers.enabled = settings.metrics_enabled
+    model_store, lag_provider = await asyncio.gather(
+        asyncio.to_thread(
+            ModelStore,
+            settings.model_path,
+            settings.schema_path,
+            compiled=settings.compiled_inference,
+            model_format=settings.model_format,
+        ),
+        asyncio.to_thread(BaselineLagProvider, settings.baseline_path),
+    )
+    zones = ZoneRegistry.from_file(
+        settings.zones_path,
+        default_zone=Zone(DEFAULT_ZONE, settings.latitude, settings.longitude, settings.timezone),
+        default_lags=lag_provider,
+        max_baselines=settings.zone_baselines_max,
+    )
+    weather_client = WeatherClient(
+        ttl_seconds=settings.weather_cache_ttl,
+        max_connections=settings.weather_max_connections,
+        max_days=settings.weather_cache_max_days,
+        url=settings.weather_url,
+    )
+    return Services(settings, model_store, weather_client, lag_provider, zones)
 
-model_store = ModelStore(settings.model_path, settings.schema_path)
-weather_client = WeatherClient(ttl_seconds=settings.weather_cache_ttl)
 
-lag_provider = BaselineLagProvider("artifacts/demand_baseline.csv")
+# Set by the app lifespan.
+services: Optional[Services] = None
 
 
+def get_services() -> Services:
+    if services is None:
+        raise RuntimeError("Services are not initialised yet (app lifespan has not run).")
+    return services
@@ -1,16 +1,44 @@
-from fastapi import FastAPI, HTTPException
+import asyncio
+import json
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import AsyncIterator, List, Union
+
+from fastapi import Depends, FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from pydantic import TypeAdapter, ValidationError
 
+from app import deps
 from app.config import settings
-from app.deps import model_store, weather_client, lag_provider
+from app.deps import Services, get_services
 from app.schemas import (
     PredictRequest, PredictResponse,
+    PredictBatchRequest, PredictBatchResponse, PredictBatchItem,
     ForecastRequest, ForecastResponse, ForecastPoint,
+    ForecastColumns, ForecastColumnarResponse, ForecastStreamHeader,
+    ForecastMultiRequest, ForecastMultiResponse, ZoneForecast, ZoneInfo,
     ModelInfo,
 )
-from app.services.predictors import predict_single, forecast_range
+from app.services.inference import InferenceSaturated
+from app.services.metrics import PrometheusText, stage_timers
+from app.services.model_store import LoadedModel, ModelReloadInProgress
+from app.services.predictors import predict_single, predict_many, forecast_range, forecast_stream, forecast_multi
+from app.services.weather_open_meteo import WEATHER_FIELDS
+
+_datetime_adapter = TypeAdapter(datetime)
+
+NDJSON = "application/x-ndjson"
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    deps.services = await deps.build_services(settings)
+    await deps.services.start()
+    yield
+    await deps.services.stop()
+    deps.services = None
 
-app = FastAPI(title="Taxi Demand API", version="0.1.0")
+app = FastAPI(title="Taxi Demand API", version="0.1.0", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -24,26 +52,132 @@ app.add_middleware(
 def health():
     return {"status": "ok"}
 
-@app.get("/model-info", response_model=ModelInfo)
-def model_info():
+@app.get("/stats")
+def stats(svc: Services = Depends(get_services)):
+    return {
+        "weather": svc.weather_client.stats(),
+        "inference": {
+            "kind": svc.inference_pool.kind,
+            "workers": svc.inference_pool.workers,
+            "queue_depth": svc.inference_pool.queue_depth,
+            "pending": svc.inference_pool.pending,
+        },
+        "batcher": svc.batcher.stats() if svc.batcher is not None else None,
+        "forecast_cache": svc.forecast_cache.stats() if svc.forecast_cache is not None else None,
+        "materialized": svc.materializer.stats() if svc.materializer is not None else None,
+        "zones": svc.zones.stats(),
+    }
+
+def _metrics_text(svc: Services) -> str:
+    out = PrometheusText()
+    out.histograms(
+        "taxi_stage_seconds",
+        "Time spent per request stage (predict.*, forecast.*, weather.*, lags.*, model.*).",
+        "stage",
+        stage_timers.stages(),
+    )
+
+    w = svc.weather_client.stats()
+    out.metric("taxi_weather_cache_lookups_total", "counter", "Weather days looked up, by cache result.", [
+        ({"result": "hit"}, w["hits"]),
+        ({"result": "stale_hit"}, w["stale_hits"]),
+        ({"result": "miss"}, w["misses"]),
+    ])
+    out.metric("taxi_weather_upstream_requests_total", "counter", "Requests sent to Open-Meteo.",
+               [(None, w["upstream_requests"])])
+    out.metric("taxi_weather_upstream_errors_total", "counter", "Failed Open-Meteo requests.",
+               [(None, w["upstream_errors"])])
+    out.metric("taxi_weather_refreshes_total", "counter", "Background refreshes of expired days.",
+               [(None, w["refreshes"])])
+    out.metric("taxi_weather_evictions_total", "counter", "Days evicted from the weather cache.",
+               [(None, w["evictions"])])
+    out.metric("taxi_weather_days_cached", "gauge", "Days of hourly weather held.", [(None, w["days_cached"])])
+
+    if svc.forecast_cache is not None:
+        f = svc.forecast_cache.stats()
+        out.metric("taxi_forecast_cache_lookups_total", "counter", "Forecast cache lookups, by result.", [
+            ({"result": "hit"}, f["hits"]),
+            ({"result": "miss"}, f["misses"]),
+        ])
+        out.metric("taxi_forecast_cache_entries", "gauge", "Memoized forecasts held.", [(None, f["entries"])])
+
+    if svc.batcher is not None:
+        b = svc.batcher.stats()
+        out.metric("taxi_microbatch_batches_total", "counter", "Micro-batches sent to the model.", [(None, b["batches"])])
+        out.metric("taxi_microbatch_rows_total", "counter", "Rows predicted through micro-batches.", [(None, b["rows"])])
+
+    out.metric("taxi_inference_pending", "gauge", "Model jobs running or queued.", [(None, svc.inference_pool.pending)])
+
+    z = svc.zones.stats()
+    out.metric("taxi_zone_baseline_loads_total", "counter", "Per-zone lag baselines loaded.", [(None, z["baseline_loads"])])
+
+    m = svc.model_store.current()
+    out.metric("taxi_model_info", "gauge", "Loaded model (value is always 1).", [(
+        {"version": m.version, "format": svc.settings.model_format, "compiled": str(m.compiled is not None).lower()},
+        1,
+    )])
+    out.metric("taxi_model_load_seconds", "gauge", "Load + warm-up time of the live model.", [(None, m.load_seconds)])
+    out.metric("taxi_model_loaded_timestamp_seconds", "gauge", "When the live model was loaded.",
+               [(None, m.loaded_at.timestamp())])
+    return out.render()
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics(svc: Services = Depends(get_services)):
+    """Prometheus text exposition; model.load in taxi_stage_seconds covers every load and reload."""
+    return PlainTextResponse(_metrics_text(svc), media_type=PrometheusText.CONTENT_TYPE)
+
+def _model_info(m: LoadedModel) -> ModelInfo:
     return ModelInfo(
-        model_loaded=model_store.model is not None,
-        features=model_store.features,
+        model_loaded=m.loaded,
+        features=m.features,
         model_path=settings.model_path,
         schema_path=settings.schema_path,
+        version=m.version,
+        loaded_at=m.loaded_at,
+        load_seconds=m.load_seconds,
+        compiled=m.compiled is not None,
+        model_format=settings.model_format,
+        memory_before_mb=m.memory_before,
+        memory_after_mb=m.memory_after,
     )
 
+@app.get("/model-info", response_model=ModelInfo)
+def model_info(svc: Services = Depends(get_services)):
+    return _model_info(svc.model_store.current())
+
+@app.post("/model/reload", response_model=ModelInfo)
+async def model_reload(svc: Services = Depends(get_services)):
+    try:
+        loaded = await asyncio.to_thread(svc.model_store.reload)
+    except ModelReloadInProgress as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except (FileNotFoundError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=f"Reload rejected, keeping current model: {e}")
+    svc.inference_pool.reset()
+    return _model_info(loaded)
+
 @app.post("/predict", response_model=PredictResponse)
-async def predict(req: PredictRequest):
+async def predict(req: PredictRequest, svc: Services = Depends(get_services)):
+    hit = svc.materializer.predict_at(req.target_datetime) if svc.materializer is not None else None
+    if hit is not None:
+        return PredictResponse(
+            target_datetime=hit["target_datetime"],
+            demand=hit["demand"],
+            weather_used=hit["weather_used"],
+            features_used=hit["features_used"],
+            warnings=hit["warnings"],
+        )
     try:
         yhat, weather_used, feats, warnings = await predict_single(
-            model_store=model_store,
-            weather_client=weather_client,
-            lat=settings.latitude,
-            lon=settings.longitude,
-            timezone=settings.timezone,
+            model_store=svc.model_store,
+            weather_client=svc.weather_client,
+            lat=svc.settings.latitude,
+            lon=svc.settings.longitude,
+            timezone=svc.settings.timezone,
             target_dt=req.target_datetime,
-            lag_provider=lag_provider,
+            lag_provider=svc.lag_provider,
+            inference=svc.inference_pool,
+            batcher=svc.batcher,
         )
         return PredictResponse(
             target_datetime=req.target_datetime.replace(minute=0, second=0, microsecond=0),
@@ -54,28 +188,168 @@ async def predict(req: PredictRequest):
         )
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
+    except InferenceSaturated as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
     except Exception as e:
         raise HTTPException(status_code=503, detail=f"Service error: {e}")
 
-@app.post("/forecast", response_model=ForecastResponse)
-async def forecast(req: ForecastRequest):
+@app.post("/predict/batch", response_model=PredictBatchResponse)
+async def predict_batch(req: PredictBatchRequest, svc: Services = Depends(get_services)):
+    parsed = []
+    items = []
+    for raw in req.target_datetimes:
+        try:
+            parsed.append((len(items), _datetime_adapter.validate_python(raw)))
+            items.append(PredictBatchItem(input=raw))
+        except ValidationError:
+            items.append(PredictBatchItem(input=raw, error=f"Invalid datetime: {raw!r}"))
+
     try:
-        preds, warnings = await forecast_range(
-            model_store=model_store,
-            weather_client=weather_client,
-            lat=settings.latitude,
-            lon=settings.longitude,
-            timezone=settings.timezone,
-            start_dt=req.start_datetime,
-            hours=req.hours,
+        results = await predict_many(
+            model_store=svc.model_store,
+            weather_client=svc.weather_client,
+            lat=svc.settings.latitude,
+            lon=svc.settings.longitude,
+            timezone=svc.settings.timezone,
+            target_dts=[dt for _, dt in parsed],
+            lag_provider=svc.lag_provider,
+            inference=svc.inference_pool,
         )
-        return ForecastResponse(
-            start_datetime=req.start_datetime.replace(minute=0, second=0, microsecond=0),
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except InferenceSaturated as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+    except Exception as e:
+        raise HTTPException(status_code=503, detail=f"Service error: {e}")
+
+    for (idx, _), res in zip(parsed, results):
+        items[idx] = PredictBatchItem(input=items[idx].input, **res)
+    return PredictBatchResponse(items=items)
+
+def _columns(preds: List[dict]) -> ForecastColumns:
+    return ForecastColumns(
+        datetime=[p["datetime"] for p in preds],
+        demand=[p["demand"] for p in preds],
+        weather={f: [p["weather_used"][f] for p in preds] for f in WEATHER_FIELDS},
+    )
+
+async def _single_chunk(preds: List[dict]) -> AsyncIterator[List[dict]]:
+    yield preds
+
+async def _ndjson_lines(header: ForecastStreamHeader, chunks: AsyncIterator[List[dict]]) -> AsyncIterator[str]:
+    yield header.model_dump_json() + "\n"
+    try:
+        async for chunk in chunks:
+            if header.format == "columnar":
+                yield _columns(chunk).model_dump_json() + "\n"
+            else:
+                yield "".join(ForecastPoint(**p).model_dump_json() + "\n" for p in chunk)
+    except Exception as e:
+        # the status line is already sent, so the error goes in-band
+        yield json.dumps({"error": f"Service error: {e}"}) + "\n"
+
+@app.post("/forecast", response_model=Union[ForecastResponse, ForecastColumnarResponse])
+async def forecast(req: ForecastRequest, request: Request, svc: Services = Depends(get_services)):
+    """
+    Accept: application/x-ndjson streams the forecast line by line as hours are
+    computed (see ForecastStreamHeader); format="columnar" returns parallel arrays.
+    """
+    stream = NDJSON in request.headers.get("accept", "")
+    start_h = req.start_datetime.replace(minute=0, second=0, microsecond=0)
+    hit = svc.materializer.forecast_slice(req.start_datetime, req.hours) if svc.materializer is not None else None
+    try:
+        if hit is not None:
+            preds, warnings = hit
+            chunks = _single_chunk(preds)
+        else:
+            run = forecast_stream if stream else forecast_range
+            result = await run(
+                model_store=svc.model_store,
+                weather_client=svc.weather_client,
+                lat=svc.settings.latitude,
+                lon=svc.settings.longitude,
+                timezone=svc.settings.timezone,
+                start_dt=req.start_datetime,
+                hours=req.hours,
+                lag_provider=svc.lag_provider,
+                inference=svc.inference_pool,
+                cache=svc.forecast_cache,
+            )
+            if stream:
+                warnings, chunks = result
+            else:
+                preds, warnings = result
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except InferenceSaturated as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+    except Exception as e:
+        raise HTTPException(status_code=503, detail=f"Service error: {e}")
+
+    if stream:
+        header = ForecastStreamHeader(start_datetime=start_h, hours=req.hours, format=req.format, warnings=warnings)
+        return StreamingResponse(_ndjson_lines(header, chunks), media_type=NDJSON)
+    if req.format == "columnar":
+        return ForecastColumnarResponse(
+            start_datetime=start_h,
             hours=req.hours,
-            predictions=[ForecastPoint(**p) for p in preds],
+            columns=_columns(preds),
             warnings=warnings,
         )
+    return ForecastResponse(
+        start_datetime=start_h,
+        hours=req.hours,
+        predictions=[ForecastPoint(**p) for p in preds],
+        warnings=warnings,
+    )
+
+@app.get("/zones", response_model=List[ZoneInfo])
+def zones(svc: Services = Depends(get_services)):
+    return [ZoneInfo(**z.as_dict()) for z in svc.zones.zones()]
+
+@app.post("/forecast/multi", response_model=ForecastMultiResponse)
+async def forecast_zones(req: ForecastMultiRequest, svc: Services = Depends(get_services)):
+    try:
+        targets = [svc.zones.get(z) for z in req.zones] + [
+            svc.zones.location(loc.latitude, loc.longitude, loc.timezone or svc.settings.timezone)
+            for loc in req.locations
+        ]
+        lag_providers = await asyncio.to_thread(svc.zones.lag_providers, targets)
+        results = await forecast_multi(
+            model_store=svc.model_store,
+            weather_client=svc.weather_client,
+            zones=targets,
+            lag_providers=lag_providers,
+            start_dt=req.start_datetime,
+            hours=req.hours,
+            inference=svc.inference_pool,
+            cache=svc.forecast_cache,
+        )
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
+    except InferenceSaturated as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
     except Exception as e:
         raise HTTPException(status_code=503, detail=f"Service error: {e}")
+
+    out = []
+    for zone, res in zip(targets, results):
+        preds = res["predictions"]
+        item = ZoneForecast(
+            zone=zone.zone_id,
+            latitude=zone.latitude,
+            longitude=zone.longitude,
+            timezone=zone.timezone,
+            warnings=res["warnings"],
+            error=res["error"],
+        )
+        if preds is not None and req.format == "columnar":
+            item.columns = _columns(preds)
+        elif preds is not None:
+            item.predictions = [ForecastPoint(**p) for p in preds]
+        out.append(item)
+    return ForecastMultiResponse(
+        start_datetime=req.start_datetime.replace(minute=0, second=0, microsecond=0),
+        hours=req.hours,
+        zones=out,
+    )
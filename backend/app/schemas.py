@@ -1,6 +1,6 @@
 from datetime import datetime
-from typing import List, Optional
-from pydantic import BaseModel, Field, conint
+from typing import Dict, List, Literal, Optional
+from pydantic import BaseModel, Field, confloat, conint, conlist, model_validator
 
 class PredictRequest(BaseModel):
     target_datetime: datetime = Field(..., description="ISO datetime, e.g. 2026-01-03T14:00:00")
@@ -13,9 +13,33 @@ class PredictResponse(BaseModel):
     features_used: dict
     warnings: List[str] = []
 
+class PredictBatchRequest(BaseModel):
+    # strings, so one unparseable timestamp fails its item instead of the whole batch
+    target_datetimes: conlist(str, min_length=1, max_length=500) = Field(
+        ..., description="ISO datetimes, e.g. [\"2026-01-03T14:00:00\", ...] (max 500)"
+    )
+
+class PredictBatchItem(BaseModel):
+    input: str
+    target_datetime: Optional[datetime] = None
+    demand: Optional[float] = None
+    weather_used: Optional[dict] = None
+    features_used: Optional[dict] = None
+    warnings: List[str] = []
+    error: Optional[str] = None
+
+class PredictBatchResponse(BaseModel):
+    unit: str = "rides_per_hour"
+    items: List[PredictBatchItem]
+    warnings: List[str] = []
+
 class ForecastRequest(BaseModel):
     start_datetime: datetime = Field(..., description="Start ISO datetime (floored to hour)")
     hours: conint(ge=1, le=168) = Field(168, description="Forecast horizon in hours (max 168)")
+    format: Literal["points", "columnar"] = Field(
+        "points",
+        description='"points": one object per hour; "columnar": parallel arrays per field',
+    )
 
 class ForecastPoint(BaseModel):
     datetime: datetime
@@ -29,8 +53,86 @@ class ForecastResponse(BaseModel):
     predictions: List[ForecastPoint]
     warnings: List[str] = []
 
+class ForecastColumns(BaseModel):
+    """Parallel arrays, one entry per hour."""
+    datetime: List[datetime]
+    demand: List[float]
+    weather: Dict[str, List[float]]
+
+class ForecastColumnarResponse(BaseModel):
+    start_datetime: datetime
+    hours: int
+    unit: str = "rides_per_hour"
+    columns: ForecastColumns
+    warnings: List[str] = []
+
+class ForecastStreamHeader(BaseModel):
+    """
+    First line of an application/x-ndjson /forecast response. Each following
+    line is a ForecastPoint ("points") or a ForecastColumns chunk ("columnar");
+    a failure after streaming started ends the stream with {"error": ...}.
+    """
+    start_datetime: datetime
+    hours: int
+    unit: str = "rides_per_hour"
+    format: str
+    warnings: List[str] = []
+
+MAX_ZONES_PER_REQUEST = 50
+
+class Location(BaseModel):
+    latitude: confloat(ge=-90, le=90)
+    longitude: confloat(ge=-180, le=180)
+    timezone: Optional[str] = Field(None, description="Open-Meteo timezone; defaults to the service timezone")
+
+class ForecastMultiRequest(BaseModel):
+    start_datetime: datetime = Field(..., description="Start ISO datetime (floored to hour)")
+    hours: conint(ge=1, le=168) = Field(168, description="Forecast horizon in hours (max 168)")
+    zones: List[str] = Field([], description="Zone ids, see GET /zones")
+    locations: List[Location] = Field([], description="Ad-hoc locations (default lag baseline)")
+    format: Literal["points", "columnar"] = "points"
+
+    @model_validator(mode="after")
+    def _check_count(self):
+        n = len(self.zones) + len(self.locations)
+        if not 1 <= n <= MAX_ZONES_PER_REQUEST:
+            raise ValueError(f"Give between 1 and {MAX_ZONES_PER_REQUEST} zones/locations, got {n}.")
+        return self
+
+class ZoneForecast(BaseModel):
+    zone: str
+    latitude: float
+    longitude: float
+    timezone: str
+    # one of predictions / columns, depending on the request format
+    predictions: Optional[List[ForecastPoint]] = None
+    columns: Optional[ForecastColumns] = None
+    warnings: List[str] = []
+    error: Optional[str] = None
+
+class ForecastMultiResponse(BaseModel):
+    start_datetime: datetime
+    hours: int
+    unit: str = "rides_per_hour"
+    zones: List[ZoneForecast]
+
+class ZoneInfo(BaseModel):
+    zone: str
+    latitude: float
+    longitude: float
+    timezone: str
+    baseline_path: Optional[str] = None
+
 class ModelInfo(BaseModel):
     model_loaded: bool
     features: List[str]
     model_path: str
     schema_path: str
+    version: str
+    loaded_at: datetime
+    load_seconds: float
+    compiled: bool = False
+    model_format: str = "joblib"
+    # process memory (MB) around the load: {"rss": ..., "private": ...}
+    memory_before_mb: dict = {}
+    memory_after_mb: dict = {}
@@ -0,0 +1,103 @@
+from __future__ import annotations
+import asyncio
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from app.services.inference import InferencePool, run_model
+from app.services.model_store import LoadedModel, predict_matrix
+
+class MicroBatcher:
+    """
+    Collects single feature rows from concurrent requests and predicts them together.
+
+    A batch is flushed when it reaches max_batch rows or max_wait_ms after its
+    first row arrived, whichever comes first. Each caller awaits its own future.
+    A batch only holds rows of one model version: each row is predicted by the
+    LoadedModel its caller built it for, so a reload never mixes layouts.
+    """
+
+    def __init__(
+        self,
+        inference: Optional[InferencePool] = None,
+        max_batch: int = 32,
+        max_wait_ms: float = 2.0,
+    ):
+        self.inference = inference
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self._rows: List[np.ndarray] = []
+        self._futures: List[asyncio.Future] = []
+        # model the pending rows were built for
+        self._model: Optional[LoadedModel] = None
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks = set()
+        # batch size histogram: power-of-two upper bounds up to max_batch
+        self._bounds: List[int] = []
+        b = 1
+        while b < max_batch:
+            self._bounds.append(b)
+            b *= 2
+        self._bounds.append(max_batch)
+        self._hist = [0] * len(self._bounds)
+        self._batches = 0
+        self._rows_total = 0
+
+    async def predict_row(self, model: LoadedModel, x: np.ndarray) -> float:
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+        if self._rows and self._model.version != model.version:
+            # a reload happened: send the old model's rows off on their own
+            self._flush()
+        self._model = model
+        self._rows.append(x)
+        self._futures.append(fut)
+        if len(self._rows) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+        return await fut
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._rows:
+            return
+        rows, futures, model = self._rows, self._futures, self._model
+        self._rows, self._futures, self._model = [], [], None
+        self._record(len(rows))
+        task = asyncio.ensure_future(self._run(model, np.vstack(rows), futures))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, model: LoadedModel, X: np.ndarray, futures: List[asyncio.Future]) -> None:
+        try:
+            yhat = await run_model(model, self.inference, predict_matrix, X)
+        except Exception as e:
+            for fut in futures:
+                if not fut.done():
+                    fut.set_exception(e)
+            return
+        for fut, y in zip(futures, yhat):
+            if not fut.done():
+                fut.set_result(float(y))
+
+    def _record(self, size: int) -> None:
+        self._batches += 1
+        self._rows_total += size
+        for i, bound in enumerate(self._bounds):
+            if size <= bound:
+                self._hist[i] += 1
+                break
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "max_batch": self.max_batch,
+            "max_wait_ms": self.max_wait * 1000.0,
+            "batches": self._batches,
+            "rows": self._rows_total,
+            "mean_batch_size": self._rows_total / self._batches if self._batches else 0.0,
+            # count of batches with size <= bound (and > the previous bound)
+            "batch_size_histogram": {str(b): n for b, n in zip(self._bounds, self._hist)},
+        }
@@ -0,0 +1,171 @@
+from __future__ import annotations
+import hashlib
+import json
+import shutil
+from pathlib import Path
+from typing import List, Tuple
+
+import numpy as np
+
+class CompiledForest:
+    """
+    Tree ensemble flattened into packed NumPy arrays.
+
+    All estimators' nodes live in one set of arrays; children hold global node
+    indices and leaves point at themselves, so every row can walk every tree in
+    lockstep for max_depth steps. Predicts the mean of the reached leaf values,
+    like RandomForestRegressor, without sklearn's per-call validation or joblib
+    dispatch.
+    """
+
+    def __init__(
+        self,
+        feature: np.ndarray,
+        threshold: np.ndarray,
+        left: np.ndarray,
+        right: np.ndarray,
+        value: np.ndarray,
+        roots: np.ndarray,
+        max_depth: int,
+        n_features: int,
+    ):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        self.roots = roots
+        self.max_depth = int(max_depth)
+        self.n_features = int(n_features)
+
+    @classmethod
+    def from_model(cls, model) -> "CompiledForest":
+        estimators = getattr(model, "estimators_", None)
+        if not estimators:
+            raise ValueError("Model has no fitted estimators_ to compile.")
+
+        trees = [est.tree_ for est in estimators]
+        if any(t.n_outputs != 1 for t in trees):
+            raise ValueError("Only single-output regression forests can be compiled.")
+
+        sizes = [t.node_count for t in trees]
+        offsets = np.concatenate([[0], np.cumsum(sizes)[:-1]]).astype(np.int32)
+        total = int(sum(sizes))
+
+        feature = np.empty(total, dtype=np.int32)
+        threshold = np.empty(total, dtype=np.float64)
+        left = np.empty(total, dtype=np.int32)
+        right = np.empty(total, dtype=np.int32)
+        value = np.empty(total, dtype=np.float64)
+
+        for t, off in zip(trees, offsets):
+            sl = slice(off, off + t.node_count)
+            own = np.arange(off, off + t.node_count, dtype=np.int32)
+            is_leaf = t.children_left < 0
+            # leaves loop onto themselves so extra steps are no-ops
+            feature[sl] = np.where(is_leaf, 0, t.feature)
+            threshold[sl] = np.where(is_leaf, 0.0, t.threshold)
+            left[sl] = np.where(is_leaf, own, t.children_left + off)
+            right[sl] = np.where(is_leaf, own, t.children_right + off)
+            value[sl] = t.value[:, 0, 0]
+
+        return cls(
+            feature=feature,
+            threshold=threshold,
+            left=left,
+            right=right,
+            value=value,
+            roots=offsets,
+            max_depth=max(t.max_depth for t in trees),
+            n_features=int(model.n_features_in_),
+        )
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        X = np.asarray(X)
+        if X.ndim != 2 or X.shape[1] != self.n_features:
+            raise ValueError(f"Expected matrix of shape (n, {self.n_features}), got {X.shape}.")
+        # sklearn compares float32 inputs against float64 thresholds; do the same
+        Xf = X.astype(np.float32).astype(np.float64)
+
+        n = Xf.shape[0]
+        rows = np.arange(n)[:, None]
+        nodes = np.broadcast_to(self.roots, (n, self.roots.shape[0])).copy()
+        for _ in range(self.max_depth):
+            go_left = Xf[rows, self.feature[nodes]] <= self.threshold[nodes]
+            nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+
+        return self.value[nodes].mean(axis=1)
+
+    def check_parity(self, model, n_rows: int = 64, seed: int = 0) -> float:
+        """
+        Compare against model.predict on probe rows drawn around the split thresholds.
+        Returns the max absolute difference.
+        """
+        rng = np.random.default_rng(seed)
+        splits = self.left != np.arange(self.left.shape[0])
+        cols: List[np.ndarray] = []
+        for j in range(self.n_features):
+            th = self.threshold[splits & (self.feature == j)]
+            if th.size == 0:
+                cols.append(rng.normal(size=n_rows))
+                continue
+            lo, hi = float(th.min()), float(th.max())
+            pad = max(hi - lo, 1.0) * 0.1
+            cols.append(rng.uniform(lo - pad, hi + pad, size=n_rows))
+        X = np.column_stack(cols)
+        return float(np.max(np.abs(self.predict(X) - model.predict(X))))
+
+    # --- flat on-disk layout: one .npy per array + meta.json, openable with mmap ---
+
+    ARRAYS = ("feature", "threshold", "left", "right", "value", "roots")
+
+    def save(self, path: str, features: List[str]) -> None:
+        """
+        Write the packed arrays as uncompressed .npy files plus meta.json.
+        Written to a temp dir and renamed into place so readers never see a partial export.
+        """
+        out = Path(path)
+        tmp = out.with_name(out.name + ".tmp")
+        if tmp.exists():
+            shutil.rmtree(tmp)
+        tmp.mkdir(parents=True)
+
+        h = hashlib.sha256()
+        for name in self.ARRAYS:
+            arr = np.ascontiguousarray(getattr(self, name))
+            np.save(tmp / f"{name}.npy", arr)
+            h.update(arr.tobytes())
+        meta = {
+            "format": "compiled_forest/v1",
+            "features": list(features),
+            "n_features": self.n_features,
+            "n_trees": int(self.roots.shape[0]),
+            "n_nodes": int(self.feature.shape[0]),
+            "max_depth": self.max_depth,
+            "sha256": h.hexdigest(),
+        }
+        (tmp / "meta.json").write_text(json.dumps(meta, indent=2), encoding="utf-8")
+
+        if out.exists():
+            old = out.with_name(out.name + ".old")
+            if old.exists():
+                shutil.rmtree(old)
+            out.rename(old)
+            tmp.rename(out)
+            # processes that still map the old files keep them until they unmap
+            shutil.rmtree(old)
+        else:
+            tmp.rename(out)
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> Tuple["CompiledForest", dict]:
+        """
+        Open an export written by save(). With mmap the arrays are read-only
+        views of the page cache, shared by every process mapping the same files.
+        """
+        p = Path(path)
+        meta = json.loads((p / "meta.json").read_text(encoding="utf-8"))
+        mode = "r" if mmap else None
+        arrays = {name: np.load(p / f"{name}.npy", mmap_mode=mode) for name in cls.ARRAYS}
+        forest = cls(max_depth=meta["max_depth"], n_features=meta["n_features"], **arrays)
+        return forest, meta
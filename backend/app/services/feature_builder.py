@@ -1,30 +1,110 @@
 import math
 from datetime import datetime
-from typing import Dict, List, Optional
-
-from app.services.weather_open_meteo import WeatherPoint
-
-def calendar_features(dt: datetime) -> Dict[str, float]:
-    hour = dt.hour
-    return {
-        "hour_of_day": hour,
-        "day_of_week": dt.weekday(),
-        "month": dt.month,
-        "hour_sin": math.sin(2 * math.pi * hour / 24),
-        "hour_cos": math.cos(2 * math.pi * hour / 24),
-    }
-
-def weather_features(w: WeatherPoint) -> Dict[str, float]:
-    return {
-        "temp": w.temp,
-        "rhum": w.rhum,
-        "prcp": w.prcp,
-        "wspd": w.wspd,
-        "pres": w.pres,
-    }
+from functools import lru_cache
+from typing import Dict, List, Mapping, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from app.services.weather_open_meteo import WEATHER_FIELDS, WeatherBlock, WeatherPoint, epoch_hour
+
+LAG_FEATURES = ["lag_1", "lag_24", "roll_24_mean"]
+CALENDAR_FEATURES = ["hour_of_day", "day_of_week", "month", "hour_sin", "hour_cos"]
+# reported as ints in features_used
+INT_FEATURES = ("hour_of_day", "day_of_week", "month")
+
+# Per-hour lookup tables of math.sin/math.cos(2*pi*h/24), so every path gets identical values.
+HOUR_SIN = np.array([math.sin(2 * math.pi * h / 24) for h in range(24)])
+HOUR_COS = np.array([math.cos(2 * math.pi * h / 24) for h in range(24)])
 
 def optional_lag_features(required_features: List[str]) -> List[str]:
-    return [f for f in ["lag_1", "lag_24", "roll_24_mean"] if f in required_features]
+    return [f for f in LAG_FEATURES if f in required_features]
+
+class FeatureLayout:
+    """
+    Column index of every feature in a schema, grouped by source.
+    Resolved once per schema via feature_layout().
+    """
+    __slots__ = ("features", "calendar", "weather", "lags")
+
+    def __init__(self, features: Sequence[str]):
+        index = {f: i for i, f in enumerate(features)}
+        unknown = [f for f in features if f not in CALENDAR_FEATURES and f not in WEATHER_FIELDS and f not in LAG_FEATURES]
+        if unknown:
+            raise ValueError(f"Schema lists features the feature builder cannot produce: {unknown}.")
+        self.features = tuple(features)
+        self.calendar: List[Tuple[str, int]] = [(f, index[f]) for f in CALENDAR_FEATURES if f in index]
+        self.weather: List[Tuple[str, int]] = [(f, index[f]) for f in WEATHER_FIELDS if f in index]
+        self.lags: List[Tuple[str, int]] = [(f, index[f]) for f in LAG_FEATURES if f in index]
+
+@lru_cache(maxsize=16)
+def _layout(features: Tuple[str, ...]) -> FeatureLayout:
+    return FeatureLayout(features)
+
+def feature_layout(features: Sequence[str]) -> FeatureLayout:
+    return _layout(tuple(features))
+
+def build_feature_matrix(
+    timestamps: Union[Sequence[datetime], np.ndarray],
+    weather_block: WeatherBlock,
+    lags_block: Optional[Mapping[str, np.ndarray]],
+    feature_order: Sequence[str],
+) -> np.ndarray:
+    """
+    Feature matrix (len(timestamps), len(feature_order)) in schema column order.
+    timestamps are naive local hours (datetimes or datetime64), weather rows are
+    looked up in weather_block by epoch hour, lags_block holds arrays aligned
+    with timestamps. Raises ValueError for hours without weather, or if lag
+    features are required but not provided.
+    """
+    layout = feature_layout(feature_order)
+    hours = np.asarray(timestamps, dtype="datetime64[h]")
+    n = len(hours)
+    X = np.empty((n, len(layout.features)), dtype=np.float64)
+
+    if layout.calendar:
+        days = hours.astype("datetime64[D]")
+        hour = (hours - days).astype(np.int64)
+        for f, j in layout.calendar:
+            if f == "hour_of_day":
+                X[:, j] = hour
+            elif f == "day_of_week":
+                X[:, j] = (days.astype(np.int64) + 3) % 7  # 1970-01-01 was a Thursday
+            elif f == "month":
+                X[:, j] = hours.astype("datetime64[M]").astype(np.int64) % 12 + 1
+            elif f == "hour_sin":
+                X[:, j] = HOUR_SIN[hour]
+            else:
+                X[:, j] = HOUR_COS[hour]
+
+    if layout.weather:
+        rows = hours.astype(np.int64) - weather_block.start
+        missing = (rows < 0) | (rows >= len(weather_block))
+        rows = np.where(missing, 0, rows)
+        if len(weather_block):
+            # Open-Meteo nulls are NaN: an hour with any null field is missing
+            for f, _ in layout.weather:
+                missing |= np.isnan(weather_block.column(f)[rows])
+        if missing.any():
+            raise ValueError(f"No weather for hour {hours[np.argmax(missing)].astype(datetime)}.")
+        for f, j in layout.weather:
+            X[:, j] = weather_block.column(f)[rows]
+
+    if layout.lags:
+        if not lags_block:
+            needed = [f for f, _ in layout.lags]
+            raise ValueError(f"Model requires lag features {needed}, but no lags were provided.")
+        for f, j in layout.lags:
+            X[:, j] = lags_block[f]
+
+    return X
+
+def matrix_row_features(row: np.ndarray, feature_order: Sequence[str]) -> Dict[str, float]:
+    """One row of build_feature_matrix as the features_used dict."""
+    feats = dict(zip(feature_order, row.tolist()))
+    for f in INT_FEATURES:
+        if f in feats:
+            feats[f] = int(feats[f])
+    return feats
 
 def build_features(
     dt: datetime,
@@ -33,25 +113,10 @@ def build_features(
     lags: Optional[Dict[str, float]] = None,
 ) -> Dict[str, float]:
     """
-    Build only what's needed according to required_features.
+    Single-row build_feature_matrix, returned as a dict in required_features order.
     If lag features are required but not provided -> raise.
     """
-    feats = {}
-    cal = calendar_features(dt)
-    we = weather_features(weather)
-
-    for k in cal:
-        if k in required_features:
-            feats[k] = cal[k]
-    for k in we:
-        if k in required_features:
-            feats[k] = we[k]
-
-    lag_needed = optional_lag_features(required_features)
-    if lag_needed:
-        if not lags:
-            raise ValueError(f"Model requires lag features {lag_needed}, but no lags were provided.")
-        for k in lag_needed:
-            feats[k] = float(lags[k])
-
-    return feats
+    block = WeatherBlock(epoch_hour(dt), **{f: np.array([v]) for f, v in weather.as_dict().items()})
+    lags_block = {k: np.array([float(v)]) for k, v in lags.items()} if lags else None
+    X = build_feature_matrix([dt], block, lags_block, required_features)
+    return matrix_row_features(X[0], required_features)
@@ -0,0 +1,119 @@
+from __future__ import annotations
+import asyncio
+import functools
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+from app.services.model_store import ModelStore
+
+class InferenceSaturated(RuntimeError):
+    """All inference workers are busy and the queue is full."""
+
+# Model store of a process-pool worker, built once by _init_worker.
+_worker_store: Optional[ModelStore] = None
+
+def _init_worker(model_path: str, schema_path: str, compiled: bool, model_format: str) -> None:
+    global _worker_store
+    _worker_store = ModelStore(model_path, schema_path, compiled=compiled, model_format=model_format)
+
+def _call_in_worker(fn: Callable, args: tuple) -> Any:
+    return fn(_worker_store, *args)
+
+class InferencePool:
+    """
+    Runs model work off the event loop on a bounded thread or process pool.
+
+    Jobs are plain functions called as fn(model, *args), where model is the
+    LoadedModel the caller captured. In process mode each worker loads its own
+    ModelStore from the same paths and passes that instead, so fn and args must
+    be picklable; call reset() after a model reload to restart the workers. At most workers + queue_depth jobs are accepted at once;
+    beyond that run() raises InferenceSaturated instead of queueing.
+    """
+
+    def __init__(
+        self,
+        model_store: ModelStore,
+        workers: int = 2,
+        queue_depth: int = 16,
+        kind: str = "thread",
+    ):
+        if kind not in ("thread", "process"):
+            raise ValueError(f"Unknown inference executor kind: {kind!r}")
+        self.model_store = model_store
+        self.kind = kind
+        self.workers = workers
+        self.queue_depth = queue_depth
+        self._pending = 0
+        self._executor: Optional[Executor] = None
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.kind == "thread":
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.workers, thread_name_prefix="inference"
+                )
+            else:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    initializer=_init_worker,
+                    initargs=(
+                        self.model_store.model_path,
+                        self.model_store.schema_path,
+                        self.model_store.use_compiled,
+                        self.model_store.model_format,
+                    ),
+                )
+        return self._executor
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    async def run(self, fn: Callable, model: Any, *args) -> Any:
+        # only touched from the event loop thread, so a plain counter is enough
+        if self._pending >= self.workers + self.queue_depth:
+            raise InferenceSaturated(
+                f"Inference queue full ({self._pending} jobs pending), retry later."
+            )
+        loop = asyncio.get_running_loop()
+        if self.kind == "thread":
+            call = functools.partial(fn, model, *args)
+        else:
+            call = functools.partial(_call_in_worker, fn, args)
+        job = self._get_executor().submit(call)
+        self._pending += 1
+        # counted until the job itself finishes, not until this awaiter gives up:
+        # a cancelled caller cannot stop a job that is already running
+        job.add_done_callback(functools.partial(self._job_done, loop))
+        return await asyncio.wrap_future(job)
+
+    def _job_done(self, loop: asyncio.AbstractEventLoop, _job) -> None:
+        # runs on the worker side; hand the decrement back to the loop thread
+        try:
+            loop.call_soon_threadsafe(self._release)
+        except RuntimeError:
+            pass  # loop already closed (shutdown): nothing left to count for
+
+    def _release(self) -> None:
+        self._pending -= 1
+
+    def reset(self) -> None:
+        """Restart process workers so they load the current artifacts; running jobs finish first."""
+        if self.kind == "process":
+            self.shutdown()
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+async def run_model(
+    model: Any,
+    inference: Optional[InferencePool],
+    fn: Callable,
+    *args,
+) -> Any:
+    """fn(model, *args) on the inference pool, or inline if there is none."""
+    if inference is None:
+        return fn(model, *args)
+    return await inference.run(fn, model, *args)
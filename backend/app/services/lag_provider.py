@@ -1,6 +1,10 @@
-import pandas as pd
+import csv
+import numpy as np
 from pathlib import Path
 from datetime import datetime, timedelta
+from typing import Dict, Sequence
+
+from app.services.metrics import timed
 
 
 class BaselineLagProvider:
@@ -13,30 +17,81 @@ class BaselineLagProvider:
                 "Create it first (make_baseline.py -> demand_baseline.csv)."
             )
 
-        base = pd.read_csv(p)
-        required_cols = {"month", "day_of_week", "hour_of_day", "mean_rides"}
-        if not required_cols.issubset(set(base.columns)):
-            raise ValueError(f"Baseline CSV must contain columns: {required_cols}")
+        with p.open(newline="", encoding="utf-8") as f:
+            reader = csv.DictReader(f)
+            required_cols = {"month", "day_of_week", "hour_of_day", "mean_rides"}
+            if not required_cols.issubset(set(reader.fieldnames or [])):
+                raise ValueError(f"Baseline CSV must contain columns: {required_cols}")
+            rows = [
+                (int(r["month"]), int(r["day_of_week"]), int(r["hour_of_day"]), float(r["mean_rides"]))
+                for r in reader
+            ]
+        if not rows:
+            raise ValueError(f"Baseline CSV is empty: {csv_path}")
+        base = np.array(rows, dtype=np.float64)
+
+        self.global_mean = float(base[:, 3].mean())
 
-        self.base = base.set_index(["month", "day_of_week", "hour_of_day"])
-        self.global_mean = float(base["mean_rides"].mean())
+        # Dense [month-1, day_of_week, hour] table, missing cells = global mean
+        table = np.full((12, 7, 24), self.global_mean, dtype=np.float64)
+        m = base[:, 0].astype(np.int64) - 1
+        d = base[:, 1].astype(np.int64)
+        h = base[:, 2].astype(np.int64)
+        ok = (m >= 0) & (m < 12) & (d >= 0) & (d < 7) & (h >= 0) & (h < 24)
+        table[m[ok], d[ok], h[ok]] = base[:, 3][ok]
+        self.table = table
+
+        # roll_24_mean covers the 24 hours before (month, dow, hour): hours 0..h-1
+        # of the same day plus hours h..23 of the previous day. The previous day
+        # is in the same month except on the 1st, hence two tables.
+        head = np.concatenate([np.zeros((12, 7, 1)), np.cumsum(table, axis=2)[:, :, :-1]], axis=2)
+        tail = np.cumsum(table[:, :, ::-1], axis=2)[:, :, ::-1]
+        prev_day_tail = np.roll(tail, 1, axis=1)
+        self.roll_24 = (head + prev_day_tail) / 24.0
+        self.roll_24_first = (head + np.roll(prev_day_tail, 1, axis=0)) / 24.0
 
     def mean_for(self, dt: datetime) -> float:
-        key = (dt.month, dt.weekday(), dt.hour)
-        try:
-            return float(self.base.loc[key, "mean_rides"])
-        except Exception:
-            return self.global_mean
+        return float(self.table[dt.month - 1, dt.weekday(), dt.hour])
 
     def get_lags(self, target_dt: datetime) -> dict:
-        
-        dt_lag1 = target_dt - timedelta(hours=1)
-        dt_lag24 = target_dt - timedelta(hours=24)
+        with timed("lags.get"):
+            dt_lag1 = target_dt - timedelta(hours=1)
+            dt_lag24 = target_dt - timedelta(hours=24)
+
+            lag_1 = self.mean_for(dt_lag1)
+            lag_24 = self.mean_for(dt_lag24)
+
+            roll = self.roll_24_first if target_dt.day == 1 else self.roll_24
+            roll_24_mean = float(roll[target_dt.month - 1, target_dt.weekday(), target_dt.hour])
+
+            return {"lag_1": lag_1, "lag_24": lag_24, "roll_24_mean": roll_24_mean}
+
+    def get_lags_batch(self, timestamps: Sequence[datetime]) -> Dict[str, np.ndarray]:
+        """
+        Vectorized get_lags for many (naive, local) timestamps.
+        Returns arrays aligned with timestamps.
+        """
+        with timed("lags.get_batch"):
+            return self._lags_batch(np.array(timestamps, dtype="datetime64[h]"))
+
+    def _lags_batch(self, hours: np.ndarray) -> Dict[str, np.ndarray]:
+        def keys(t: np.ndarray):
+            days = t.astype("datetime64[D]")
+            months = t.astype("datetime64[M]")
+            month = months.astype(np.int64) % 12
+            dow = (days.astype(np.int64) + 3) % 7  # 1970-01-01 was a Thursday
+            hour = (t - days).astype(np.int64)
+            first = days == months.astype("datetime64[D]")
+            return month, dow, hour, first
 
-        lag_1 = self.mean_for(dt_lag1)
-        lag_24 = self.mean_for(dt_lag24)
+        m1, d1, h1, _ = keys(hours - np.timedelta64(1, "h"))
+        m24, d24, h24, _ = keys(hours - np.timedelta64(24, "h"))
+        m, d, h, first = keys(hours)
 
-        vals = [self.mean_for(target_dt - timedelta(hours=i)) for i in range(1, 25)]
-        roll_24_mean = float(sum(vals) / len(vals))
+        roll = np.where(first, self.roll_24_first[m, d, h], self.roll_24[m, d, h])
 
-        return {"lag_1": lag_1, "lag_24": lag_24, "roll_24_mean": roll_24_mean}
+        return {
+            "lag_1": self.table[m1, d1, h1],
+            "lag_24": self.table[m24, d24, h24],
+            "roll_24_mean": roll,
+        }
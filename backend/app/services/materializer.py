@@ -0,0 +1,183 @@
+from __future__ import annotations
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+from app.services.inference import InferencePool
+from app.services.lag_provider import BaselineLagProvider
+from app.services.model_store import ModelStore
+from app.services.predictors import floor_to_hour, forecast_range, predict_many
+from app.services.weather_open_meteo import WeatherClient, epoch_hour
+
+log = logging.getLogger(__name__)
+
+class _Table:
+    """One materialized run: forecast and single-hour predictions from origin."""
+    __slots__ = ("origin", "origin_hour", "preds", "warnings", "singles",
+                 "model_version", "weather_fetched_at", "computed_at")
+
+    def __init__(self, origin, preds, warnings, singles, model_version, weather_fetched_at, computed_at):
+        self.origin = origin
+        self.origin_hour = epoch_hour(origin)
+        self.preds = preds
+        self.warnings = warnings
+        self.singles = singles
+        self.model_version = model_version
+        self.weather_fetched_at = weather_fetched_at
+        self.computed_at = computed_at
+
+class ForecastMaterializer:
+    """
+    Keeps a rolling forecast for one location precomputed in memory.
+
+    A background task recomputes the next horizon_hours from the current local
+    hour every interval_seconds, when the hour rolls over, when the weather for
+    the window is refreshed or when a different model is loaded. /forecast and
+    /predict read slices of the latest run by offset; anything outside the
+    window (or computed by an older model) falls back to on-demand computation.
+
+    /forecast is only served from the run when it starts at the origin: a lag
+    model's run seeds lags from the baseline before the origin and feeds its
+    own predictions forward after it, while an on-demand forecast from a later
+    start seeds from the baseline before that start. /predict singles are
+    independent per hour, so any offset in the window is served.
+    """
+
+    def __init__(
+        self,
+        model_store: ModelStore,
+        weather_client: WeatherClient,
+        lag_provider: BaselineLagProvider,
+        lat: float,
+        lon: float,
+        timezone: str,
+        horizon_hours: int = 168,
+        interval_seconds: int = 3600,
+        poll_seconds: int = 60,
+        inference: Optional[InferencePool] = None,
+    ):
+        self.model_store = model_store
+        self.weather_client = weather_client
+        self.lag_provider = lag_provider
+        self.lat = lat
+        self.lon = lon
+        self.timezone = timezone
+        self.horizon_hours = horizon_hours
+        self.interval_seconds = interval_seconds
+        self.poll_seconds = poll_seconds
+        self.inference = inference
+        self._table: Optional[_Table] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def _local_hour(self) -> datetime:
+        return floor_to_hour(datetime.now(ZoneInfo(self.timezone)).replace(tzinfo=None))
+
+    async def _loop(self) -> None:
+        while True:
+            try:
+                if await self._is_due():
+                    await self.refresh()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                log.warning("Forecast materialization failed: %s", e)
+            await asyncio.sleep(self.poll_seconds)
+
+    async def _is_due(self) -> bool:
+        table = self._table
+        if table is None:
+            return True
+        if table.origin != self._local_hour():
+            return True
+        if time.time() - table.computed_at >= self.interval_seconds:
+            return True
+        if table.model_version != self.model_store.version:
+            return True
+        # cheap when cached; also keeps the window's weather refreshed
+        block = await self.weather_client.fetch_hourly_map(
+            lat=self.lat, lon=self.lon,
+            start_dt=table.origin,
+            end_dt=table.origin + timedelta(hours=self.horizon_hours),
+            timezone=self.timezone,
+        )
+        return block.fetched_at > table.weather_fetched_at
+
+    async def refresh(self) -> None:
+        origin = self._local_hour()
+        model_version = self.model_store.version
+        block = await self.weather_client.fetch_hourly_map(
+            lat=self.lat, lon=self.lon,
+            start_dt=origin,
+            end_dt=origin + timedelta(hours=self.horizon_hours),
+            timezone=self.timezone,
+        )
+        preds, warnings = await forecast_range(
+            model_store=self.model_store,
+            weather_client=self.weather_client,
+            lat=self.lat, lon=self.lon, timezone=self.timezone,
+            start_dt=origin,
+            hours=self.horizon_hours,
+            lag_provider=self.lag_provider,
+            inference=self.inference,
+        )
+        singles = await predict_many(
+            model_store=self.model_store,
+            weather_client=self.weather_client,
+            lat=self.lat, lon=self.lon, timezone=self.timezone,
+            target_dts=[p["datetime"] for p in preds],
+            lag_provider=self.lag_provider,
+            inference=self.inference,
+        )
+        # swap in the new run in one assignment; readers see old or new, never a mix
+        self._table = _Table(origin, preds, warnings, singles, model_version, block.fetched_at, time.time())
+
+    def _usable(self) -> Optional[_Table]:
+        table = self._table
+        if table is None or table.model_version != self.model_store.version:
+            return None
+        return table
+
+    def forecast_slice(self, start_dt: datetime, hours: int) -> Optional[Tuple[List[dict], List[str]]]:
+        table = self._usable()
+        if table is None or start_dt.tzinfo is not None:
+            return None
+        if epoch_hour(floor_to_hour(start_dt)) != table.origin_hour or hours > len(table.preds):
+            return None
+        return table.preds[:hours], list(table.warnings)
+
+    def predict_at(self, target_dt: datetime) -> Optional[dict]:
+        table = self._usable()
+        if table is None or target_dt.tzinfo is not None:
+            return None
+        i = epoch_hour(floor_to_hour(target_dt)) - table.origin_hour
+        if i < 0 or i >= len(table.singles):
+            return None
+        item = table.singles[i]
+        return None if item["error"] is not None else item
+
+    def stats(self) -> dict:
+        table = self._table
+        if table is None:
+            return {"origin": None}
+        return {
+            "origin": table.origin.isoformat(),
+            "hours": len(table.preds),
+            "model_version": table.model_version,
+            "computed_at": table.computed_at,
+        }
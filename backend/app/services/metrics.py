@@ -0,0 +1,139 @@
+import threading
+import time
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Upper bounds (seconds) of the stage latency buckets, 50us .. 10s.
+STAGE_BUCKETS = (
+    0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005,
+    0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+class Histogram:
+    """Fixed-bucket histogram; observe() is a bisect plus three adds under a lock."""
+    __slots__ = ("bounds", "counts", "sum", "count", "_lock")
+
+    def __init__(self, bounds: Tuple[float, ...] = STAGE_BUCKETS):
+        self.bounds = bounds
+        # counts[i]: observations in (bounds[i-1], bounds[i]]; the last slot is +Inf
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+        # inference runs in worker threads
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        i = bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+            self.count += 1
+
+    def snapshot(self) -> Tuple[List[int], float, int]:
+        with self._lock:
+            return list(self.counts), self.sum, self.count
+
+class _Timer:
+    __slots__ = ("_hist", "_t0")
+
+    def __init__(self, hist: Histogram):
+        self._hist = hist
+
+    def __enter__(self):
+        self._t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._hist.observe(time.perf_counter() - self._t0)
+        return False
+
+class _NoTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_NO_TIMER = _NoTimer()
+
+class StageTimers:
+    """
+    One latency histogram per named stage ("forecast.weather", "model.predict", ...).
+    Histograms live in the process that observed them: with the process
+    inference executor, stages inside worker processes (model.predict) are
+    not seen here, but the surrounding *.model stages are.
+    """
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self._stages: Dict[str, Histogram] = {}
+        self._lock = threading.Lock()
+
+    def histogram(self, stage: str) -> Histogram:
+        hist = self._stages.get(stage)
+        if hist is None:
+            with self._lock:
+                hist = self._stages.setdefault(stage, Histogram())
+        return hist
+
+    def timed(self, stage: str):
+        """Context manager timing its block into stage's histogram (no-op when disabled)."""
+        if not self.enabled:
+            return _NO_TIMER
+        return _Timer(self.histogram(stage))
+
+    def observe(self, stage: str, seconds: float) -> None:
+        if self.enabled:
+            self.histogram(stage).observe(seconds)
+
+    def stages(self) -> Dict[str, Histogram]:
+        with self._lock:
+            return dict(self._stages)
+
+# Process-wide timers; Services switches them off when settings.metrics_enabled is false.
+stage_timers = StageTimers()
+
+def timed(stage: str):
+    return stage_timers.timed(stage)
+
+def _labels(labels: Optional[Dict[str, str]]) -> str:
+    if not labels:
+        return ""
+    inner = ",".join(f'{k}="{str(v)}"' for k, v in labels.items())
+    return "{" + inner + "}"
+
+def _fmt(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class PrometheusText:
+    """Builds a Prometheus text-format (0.0.4) exposition."""
+
+    CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+    def __init__(self):
+        self._lines: List[str] = []
+
+    def metric(self, name: str, kind: str, help_text: str, samples: Iterable[Tuple[Optional[Dict[str, str]], float]]) -> None:
+        self._lines.append(f"# HELP {name} {help_text}")
+        self._lines.append(f"# TYPE {name} {kind}")
+        for labels, value in samples:
+            self._lines.append(f"{name}{_labels(labels)} {_fmt(value)}")
+
+    def histograms(self, name: str, help_text: str, label: str, hists: Dict[str, Histogram]) -> None:
+        self._lines.append(f"# HELP {name} {help_text}")
+        self._lines.append(f"# TYPE {name} histogram")
+        for key in sorted(hists):
+            counts, total, n = hists[key].snapshot()
+            cumulative = 0
+            for bound, c in zip(hists[key].bounds + (float("inf"),), counts):
+                cumulative += c
+                self._lines.append(f"{name}_bucket{_labels({label: key, 'le': _fmt(bound)})} {cumulative}")
+            self._lines.append(f"{name}_sum{_labels({label: key})} {_fmt(total)}")
+            self._lines.append(f"{name}_count{_labels({label: key})} {n}")
+
+    def render(self) -> str:
+        return "\n".join(self._lines) + "\n"
@@ -1,38 +1,339 @@
+import asyncio
+import hashlib
 import json
+import logging
+import threading
+import time
+from datetime import datetime
 from pathlib import Path
-from typing import List, Optional
+from typing import List, Optional, Tuple
 
-import joblib
+import numpy as np
+
+from app.services.compiled_forest import CompiledForest
+from app.services.metrics import stage_timers, timed
+
+log = logging.getLogger(__name__)
+
+# Max abs difference tolerated between compiled and sklearn predictions at load.
+COMPILED_PARITY_TOL = 1e-6
+
+# Rows pushed through a freshly loaded model before it goes live.
+WARMUP_ROWS = (1, 8, 168)
+
+MODEL_FORMATS = ("joblib", "flat")
+
+def memory_mb() -> dict:
+    """
+    Resident memory of this process. "private" excludes file-backed pages,
+    so memory-mapped model arrays shared with other workers don't count.
+    """
+    try:
+        fields = {}
+        for line in Path("/proc/self/status").read_text().splitlines():
+            key, _, rest = line.partition(":")
+            if key in ("VmRSS", "RssAnon"):
+                fields[key] = int(rest.split()[0]) / 1024.0
+        return {"rss": fields.get("VmRSS", 0.0), "private": fields.get("RssAnon", 0.0)}
+    except OSError:
+        pass
+    try:
+        # no procfs: peak RSS is the best we have (resource is Unix-only)
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+        return {"rss": peak, "private": peak}
+    except (ImportError, OSError):
+        return {"rss": 0.0, "private": 0.0}
+
+class ModelReloadInProgress(RuntimeError):
+    """Another reload is already running."""
+
+class LoadedModel:
+    """
+    One loaded model + schema. Never mutated after load, so a request can hold
+    on to it while ModelStore swaps in a newer one.
+    """
+
+    def __init__(
+        self,
+        model,
+        features: List[str],
+        compiled: Optional[CompiledForest],
+        version: str,
+        loaded_at: datetime,
+        load_seconds: float,
+        memory_before: Optional[dict] = None,
+        memory_after: Optional[dict] = None,
+    ):
+        self.model = model
+        self.features = features
+        self.compiled = compiled
+        self.version = version
+        self.loaded_at = loaded_at
+        self.load_seconds = load_seconds
+        self.memory_before = memory_before or {}
+        self.memory_after = memory_after or {}
+
+    @property
+    def loaded(self) -> bool:
+        return self.model is not None or self.compiled is not None
+
+    def predict_batch(self, X: np.ndarray) -> np.ndarray:
+        """
+        Predict for a (n_rows, n_features) matrix with columns ordered by self.features.
+        If model missing -> stub.
+        """
+        X = np.ascontiguousarray(X, dtype=np.float64)
+        if X.ndim != 2 or X.shape[1] != len(self.features):
+            raise ValueError(
+                f"Expected feature matrix of shape (n, {len(self.features)}), got {X.shape}."
+            )
+        with timed("model.predict"):
+            if self.compiled is not None:
+                return self.compiled.predict(X)
+            if self.model is None:
+                # Stub response (for frontend integration)
+                return np.full(X.shape[0], 50.0)
+
+            return np.asarray(self.model.predict(X), dtype=np.float64)
+
+    def predict_one(self, X_row: dict) -> float:
+        """
+        Predict for single row. If model missing -> stub.
+        """
+        X = np.array([[X_row[f] for f in self.features]], dtype=np.float64)
+        return float(self.predict_batch(X)[0])
+
+def predict_matrix(model, X: np.ndarray) -> np.ndarray:
+    """Inference-pool job: model.predict_batch(X) (module level so it pickles)."""
+    return model.predict_batch(X)
 
 class ModelStore:
-    def __init__(self, model_path: str, schema_path: str):
+    """
+    model_format "joblib": model_path is a pickled sklearn forest (optionally
+    compiled at load). "flat": model_path is a directory exported by
+    CompiledForest.save, memory-mapped read-only so all workers on a host share
+    one page-cache copy of the node arrays.
+    """
+
+    def __init__(self, model_path: str, schema_path: str, compiled: bool = False, model_format: str = "joblib"):
+        if model_format not in MODEL_FORMATS:
+            raise ValueError(f"Unknown model format {model_format!r}, expected one of {MODEL_FORMATS}.")
         self.model_path = model_path
         self.schema_path = schema_path
-        self.model = None
-        self.features: List[str] = []
-        self._load_schema()
-        self._try_load_model()
+        self.use_compiled = compiled
+        self.model_format = model_format
+        self._reload_lock = threading.Lock()
+        # Startup tolerates a missing model file (stub predictions), reloads don't.
+        self._active: LoadedModel = self._load(require_model=False)
+        self._watch_task: Optional[asyncio.Task] = None
 
-    def _load_schema(self):
-        data = json.loads(Path(self.schema_path).read_text(encoding="utf-8"))
-        self.features = data["features"]
+    # --- active model (swapped atomically by reload) ---
+
+    def current(self) -> LoadedModel:
+        """The live model; hold on to it for the duration of a request."""
+        return self._active
+
+    @property
+    def model(self):
+        return self._active.model
+
+    @property
+    def features(self) -> List[str]:
+        return self._active.features
+
+    @property
+    def compiled(self) -> Optional[CompiledForest]:
+        return self._active.compiled
 
-    def _try_load_model(self):
+    @property
+    def version(self) -> str:
+        """Content hash of schema + model artifact; changes whenever a new model is loaded."""
+        return self._active.version
+
+    @property
+    def loaded_at(self) -> datetime:
+        return self._active.loaded_at
+
+    def predict_batch(self, X: np.ndarray) -> np.ndarray:
+        return self._active.predict_batch(X)
+
+    def predict_one(self, X_row: dict) -> float:
+        return self._active.predict_one(X_row)
+
+    # --- loading ---
+
+    def _artifact_file(self) -> Path:
+        """The file whose presence/changes mark a model artifact."""
         p = Path(self.model_path)
-        if p.exists():
-            self.model = joblib.load(p)
+        return p / "meta.json" if self.model_format == "flat" else p
+
+    def _load(self, require_model: bool) -> LoadedModel:
+        mem_before = memory_mb()
+        t0 = time.perf_counter()
+        features = self._load_schema()
+        version = self._artifact_hash()
+
+        model = None
+        compiled = None
+        if self._artifact_file().exists():
+            if self.model_format == "flat":
+                compiled = self._load_flat(features)
+            else:
+                # imported here: joblib + the sklearn modules it unpickles are the
+                # slowest part of startup, and the flat format needs neither
+                import joblib
+                model = joblib.load(self.model_path)
+                self._check_features(model, features)
+                if self.use_compiled:
+                    compiled = self._compile(model)
+        elif require_model:
+            raise FileNotFoundError(f"Model artifact not found: {self._artifact_file()}")
+
+        loaded = LoadedModel(
+            model=model,
+            features=features,
+            compiled=compiled,
+            version=version,
+            loaded_at=datetime.now(),
+            load_seconds=0.0,
+        )
+        self._warm_up(loaded)
+        loaded.load_seconds = time.perf_counter() - t0
+        stage_timers.observe("model.load", loaded.load_seconds)
+        loaded.memory_before = mem_before
+        loaded.memory_after = memory_mb()
+        return loaded
+
+    def _load_flat(self, features: List[str]) -> CompiledForest:
+        forest, meta = CompiledForest.load(self.model_path, mmap=True)
+        if meta.get("features") != features:
+            raise ValueError(
+                f"Flat model features {meta.get('features')} do not match schema features {features}."
+            )
+        return forest
+
+    def _load_schema(self) -> List[str]:
+        data = json.loads(Path(self.schema_path).read_text(encoding="utf-8"))
+        return data["features"]
+
+    def _artifact_hash(self) -> str:
+        h = hashlib.sha256()
+        h.update(Path(self.schema_path).read_bytes())
+        p = self._artifact_file()
+        if self.model_format == "flat" and p.exists():
+            # meta.json carries a hash of the arrays written at export time
+            h.update(p.read_bytes())
+        elif p.exists():
+            with p.open("rb") as f:
+                for chunk in iter(lambda: f.read(1 << 20), b""):
+                    h.update(chunk)
         else:
-            self.model = None
+            h.update(b"stub")
+        return h.hexdigest()[:16]
 
-    def predict_one(self, X_row: dict) -> float:
+    @staticmethod
+    def _compile(model) -> Optional[CompiledForest]:
         """
-        Predict for single row. If model missing -> stub.
+        Flatten the forest for low-latency inference.
+        Falls back to sklearn if the model can't be compiled or disagrees with it.
+        """
+        try:
+            compiled = CompiledForest.from_model(model)
+            diff = compiled.check_parity(model)
+        except (AttributeError, ValueError) as e:
+            log.warning("Compiled inference disabled: %s", e)
+            return None
+        if diff > COMPILED_PARITY_TOL:
+            log.warning("Compiled inference disabled: parity check off by %.3g", diff)
+            return None
+        return compiled
+
+    @staticmethod
+    def _check_features(model, features: List[str]):
         """
-        if self.model is None:
-            # Stub response (for frontend integration)
-            # Make it deterministic-ish:
-            return float(50.0)
+        Models fitted on a DataFrame remember column names and warn on every
+        predict with a plain array. Check the order once here, then drop them
+        so predict_batch can pass NumPy matrices directly.
+        """
+        n = getattr(model, "n_features_in_", None)
+        if n is not None and n != len(features):
+            raise ValueError(f"Model expects {n} features, schema lists {len(features)}.")
+        names = getattr(model, "feature_names_in_", None)
+        if names is None:
+            return
+        if list(names) != features:
+            raise ValueError(
+                f"Model features {list(names)} do not match schema features {features}."
+            )
+        del model.feature_names_in_
+
+    @staticmethod
+    def _warm_up(loaded: LoadedModel) -> None:
+        """First predicts are slow (lazy allocations, thread pools); pay that before going live."""
+        for n in WARMUP_ROWS:
+            y = loaded.predict_batch(np.zeros((n, len(loaded.features))))
+            if not np.isfinite(y).all():
+                raise ValueError("Warm-up prediction returned non-finite values.")
+
+    def reload(self) -> LoadedModel:
+        """
+        Load, validate and warm up the current artifacts, then swap them in.
+        Requests already holding the previous model finish on it. On any error
+        the previous model stays active.
+        """
+        if not self._reload_lock.acquire(blocking=False):
+            raise ModelReloadInProgress("A model reload is already running.")
+        try:
+            loaded = self._load(require_model=True)
+            self._active = loaded
+            log.info("Model %s loaded in %.2fs", loaded.version, loaded.load_seconds)
+            return loaded
+        finally:
+            self._reload_lock.release()
+
+    # --- file watch ---
+
+    def _artifact_stamp(self) -> Tuple:
+        stamp = []
+        for path in (self._artifact_file(), self.schema_path):
+            try:
+                st = Path(path).stat()
+                stamp.append((st.st_mtime_ns, st.st_size))
+            except FileNotFoundError:
+                stamp.append(None)
+        return tuple(stamp)
+
+    def start_watch(self, interval_seconds: float, on_reload=None) -> None:
+        """Poll the artifacts every interval_seconds and reload in the background when they change."""
+        if self._watch_task is None:
+            self._watch_task = asyncio.ensure_future(self._watch(interval_seconds, on_reload))
+
+    async def stop_watch(self) -> None:
+        if self._watch_task is not None:
+            self._watch_task.cancel()
+            try:
+                await self._watch_task
+            except asyncio.CancelledError:
+                pass
+            self._watch_task = None
 
-        import pandas as pd
-        X = pd.DataFrame([X_row])[self.features]
-        return float(self.model.predict(X)[0])
+    async def _watch(self, interval_seconds: float, on_reload) -> None:
+        seen = self._artifact_stamp()
+        while True:
+            await asyncio.sleep(interval_seconds)
+            stamp = self._artifact_stamp()
+            if stamp == seen or None in stamp:
+                continue
+            # wait one more tick so a half-written file is not picked up
+            await asyncio.sleep(interval_seconds)
+            if self._artifact_stamp() != stamp:
+                continue
+            seen = stamp
+            try:
+                loaded = await asyncio.to_thread(self.reload)
+            except Exception as e:
+                log.warning("Model reload from %s failed, keeping %s: %s", self.model_path, self.version, e)
+                continue
+            if on_reload is not None:
+                on_reload(loaded)
@@ -1,21 +1,102 @@
 from __future__ import annotations
-from datetime import datetime, timedelta
-from typing import Dict, List, Tuple
+import asyncio
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+import numpy as np
+
 from app.services.lag_provider import BaselineLagProvider
-from app.services.feature_builder import build_features
-from app.services.weather_open_meteo import WeatherClient, WeatherPoint
-from app.services.model_store import ModelStore
+from app.services.batcher import MicroBatcher
+from app.services.inference import InferencePool, run_model
+from app.services.feature_builder import build_feature_matrix, matrix_row_features, optional_lag_features
+from app.services.recursive_forecast import (
+    LagRing, recursive_forecast, recursive_forecast_chunk, recursive_forecast_multi, seed_from_baseline,
+)
+from app.services.weather_open_meteo import WEATHER_FIELDS, WeatherBlock, WeatherClient, WeatherPoint, epoch_hour
+from app.services.metrics import timed
+from app.services.model_store import ModelStore, predict_matrix
+from app.services.zones import Zone
+
+# predict_many: dates this close together share one weather request
+BATCH_MAX_GAP_DAYS = 2
+BATCH_MAX_SPAN_DAYS = 16
+
+# forecast_stream: recursive chunk sizes (hours), doubling from first to max
+STREAM_FIRST_CHUNK_HOURS = 1
+STREAM_MAX_CHUNK_HOURS = 24
+
+NO_WEATHER_FOR_HOUR = "Weather API did not return data for the requested hour (timezone mismatch?)"
+
+class ForecastCache:
+    """
+    Memoized forecast_range results.
+
+    Entries are keyed by (model version, location, start hour) and remember the
+    horizon they were computed for, so a longer cached forecast answers any
+    shorter request by prefix. Each entry also records the fetch time of the
+    weather it used; if WeatherClient has refreshed any hour of the requested
+    range since then, or a different model is loaded, the entry no longer
+    matches and is dropped.
+    """
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[tuple, Tuple[float, List[dict], List[str]]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: tuple, hours: int, weather_fetched_at: float) -> Optional[Tuple[List[dict], List[str]]]:
+        entry = self._entries.get(key)
+        if entry is not None:
+            fetched_at, preds, warnings = entry
+            if weather_fetched_at > fetched_at:
+                # weather for this range was refreshed after the entry was computed
+                del self._entries[key]
+            elif len(preds) >= hours:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return preds[:hours], list(warnings)
+        self.misses += 1
+        return None
+
+    def put(self, key: tuple, weather_fetched_at: float, preds: List[dict], warnings: List[str]) -> None:
+        old = self._entries.get(key)
+        if old is not None and len(old[1]) > len(preds) and old[0] >= weather_fetched_at:
+            return
+        self._entries[key] = (weather_fetched_at, preds, list(warnings))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries), "max_entries": self.max_entries}
 
 def floor_to_hour(dt: datetime) -> datetime:
     return dt.replace(minute=0, second=0, microsecond=0)
 
+def group_dates(dates: List[date]) -> List[Tuple[date, date]]:
+    """
+    Group sorted unique dates into as few (first, last) fetch ranges as possible,
+    bridging gaps of up to BATCH_MAX_GAP_DAYS and capping each range's span.
+    """
+    groups: List[Tuple[date, date]] = []
+    for d in dates:
+        if groups:
+            first, last = groups[-1]
+            if (d - last).days <= BATCH_MAX_GAP_DAYS + 1 and (d - first).days < BATCH_MAX_SPAN_DAYS:
+                groups[-1] = (first, d)
+                continue
+        groups.append((d, d))
+    return groups
+
 async def get_weather_for_hour(
     weather_client: WeatherClient,
     lat: float,
     lon: float,
     timezone: str,
     dt: datetime,
-) -> WeatherPoint:
+) -> Tuple[WeatherBlock, WeatherPoint]:
     dt_h = floor_to_hour(dt)
     m = await weather_client.fetch_hourly_map(
         lat=lat, lon=lon,
@@ -25,8 +106,8 @@ async def get_weather_for_hour(
     )
     wp = m.get(dt_h)
     if wp is None:
-        raise ValueError("Weather API did not return data for the requested hour (timezone mismatch?)")
-    return wp
+        raise ValueError(NO_WEATHER_FOR_HOUR)
+    return m, wp
 
 async def predict_single(
     model_store: ModelStore,
@@ -36,27 +117,206 @@ async def predict_single(
     timezone: str,
     target_dt: datetime,
     lag_provider: BaselineLagProvider,
+    inference: Optional[InferencePool] = None,
+    batcher: Optional[MicroBatcher] = None,
 ) -> Tuple[float, dict, dict, List[str]]:
     
-    warnings: List[str] = []
-    dt_h = floor_to_hour(target_dt)
+    with timed("predict.total"):
+        warnings: List[str] = []
+        dt_h = floor_to_hour(target_dt)
+        model = model_store.current()
 
-    wp = await get_weather_for_hour(weather_client, lat, lon, timezone, dt_h)
+        with timed("predict.weather"):
+            block, wp = await get_weather_for_hour(weather_client, lat, lon, timezone, dt_h)
 
-    lags = None
-    if any(f in model_store.features for f in ["lag_1", "lag_24", "roll_24_mean"]):
-        lags = lag_provider.get_lags(dt_h)
-    
-    feats = build_features(
-        dt=dt_h,
-        required_features=model_store.features,
-        weather=wp,
-        lags=lags,
+        lags = None
+        if optional_lag_features(model.features):
+            with timed("predict.lags"):
+                lags = lag_provider.get_lags_batch([dt_h])
+
+        with timed("predict.features"):
+            X = build_feature_matrix([dt_h], block, lags, model.features)
+            feats = matrix_row_features(X[0], model.features)
+
+        with timed("predict.model"):
+            if batcher is not None:
+                yhat = await batcher.predict_row(model, X[0])
+            else:
+                yhat = float((await run_model(model, inference, predict_matrix, X))[0])
+
+        return yhat, wp.as_dict(), feats, warnings
+
+async def predict_many(
+    model_store: ModelStore,
+    weather_client: WeatherClient,
+    lat: float,
+    lon: float,
+    timezone: str,
+    target_dts: List[datetime],
+    lag_provider: BaselineLagProvider,
+    inference: Optional[InferencePool] = None,
+) -> List[dict]:
+    """
+    Predict many arbitrary hours with the fewest weather fetches and one model call.
+    Returns one dict per input, in order; failures are reported per item in "error".
+    """
+    model = model_store.current()
+    hours = [floor_to_hour(dt) for dt in target_dts]
+    results: List[dict] = [
+        {"target_datetime": h, "demand": None, "weather_used": None,
+         "features_used": None, "warnings": [], "error": None}
+        for h in hours
+    ]
+
+    groups = group_dates(sorted({h.date() for h in hours if h.tzinfo is None}))
+    fetched = await asyncio.gather(
+        *[
+            weather_client.fetch_hourly_map(
+                lat=lat, lon=lon,
+                start_dt=datetime.combine(first, datetime.min.time()),
+                end_dt=datetime.combine(last, datetime.min.time()),
+                timezone=timezone,
+            )
+            for first, last in groups
+        ],
+        return_exceptions=True,
     )
+    by_date: Dict[date, object] = {}
+    for (first, last), block in zip(groups, fetched):
+        d = first
+        while d <= last:
+            by_date[d] = block
+            d += timedelta(days=1)
+
+    ok: List[int] = []
+    points: List[WeatherPoint] = []
+    blocks: List[WeatherBlock] = []
+    for i, h in enumerate(hours):
+        block = by_date.get(h.date()) if h.tzinfo is None else None
+        if isinstance(block, Exception):
+            results[i]["error"] = f"Weather fetch failed: {block}"
+            continue
+        wp = block.get(h) if isinstance(block, WeatherBlock) else None
+        if wp is None:
+            results[i]["error"] = NO_WEATHER_FOR_HOUR
+            continue
+        ok.append(i)
+        points.append(wp)
+        blocks.append(block)
+
+    if not ok:
+        return results
+
+    lag_needed = optional_lag_features(model.features)
+    lags = lag_provider.get_lags_batch([hours[i] for i in ok]) if lag_needed else None
+
+    # one build_feature_matrix per fetched weather block
+    rows_by_block: Dict[int, List[int]] = {}
+    for j, block in enumerate(blocks):
+        rows_by_block.setdefault(id(block), []).append(j)
+    X = np.empty((len(ok), len(model.features)), dtype=np.float64)
+    for js in rows_by_block.values():
+        X[js] = build_feature_matrix(
+            [hours[ok[j]] for j in js],
+            blocks[js[0]],
+            {k: v[js] for k, v in lags.items()} if lags is not None else None,
+            model.features,
+        )
+
+    yhat = await run_model(model, inference, predict_matrix, X)
+
+    for j, (i, wp, y) in enumerate(zip(ok, points, yhat)):
+        results[i].update(
+            demand=float(y),
+            weather_used=wp.as_dict(),
+            features_used=matrix_row_features(X[j], model.features),
+        )
+
+    return results
+
+class _ForecastPlan:
+    """Everything forecast_range / forecast_stream need once weather and features are in place."""
+    __slots__ = ("model", "start_h", "weather", "X", "seed", "warnings", "cache_key", "weather_fetched_at")
+
+    def __init__(self, model, start_h, weather, X, seed, warnings, cache_key, weather_fetched_at):
+        self.model = model
+        self.start_h = start_h
+        self.weather = weather
+        self.X = X
+        # baseline lags before start_h; None for models without lag features
+        self.seed = seed
+        self.warnings = warnings
+        self.cache_key = cache_key
+        self.weather_fetched_at = weather_fetched_at
+
+    def points(self, offset: int, yhat: np.ndarray) -> List[dict]:
+        """Response dicts for hours offset .. offset + len(yhat)."""
+        first = epoch_hour(self.start_h) + offset
+        w = self.weather.slice(first, first + len(yhat))
+        weather_rows = zip(*(w.column(f).tolist() for f in WEATHER_FIELDS))
+        return [
+            {
+                "datetime": self.start_h + timedelta(hours=offset + i),
+                "demand": y,
+                "weather_used": dict(zip(WEATHER_FIELDS, wr)),
+            }
+            for i, (y, wr) in enumerate(zip(yhat.tolist(), weather_rows))
+        ]
+
+async def _plan_forecast(
+    model_store: ModelStore,
+    weather_client: WeatherClient,
+    lat: float,
+    lon: float,
+    timezone: str,
+    start_dt: datetime,
+    hours: int,
+    lag_provider: BaselineLagProvider,
+    cache: Optional[ForecastCache],
+) -> Tuple[Optional[Tuple[List[dict], List[str]]], Optional[_ForecastPlan]]:
+    """(cached result, None) on a cache hit, else (None, plan)."""
+    start_h = floor_to_hour(start_dt)
+    model = model_store.current()
+    end_h = start_h + timedelta(hours=hours)
+
+    with timed("forecast.weather"):
+        weather_map = await weather_client.fetch_hourly_map(
+            lat=lat, lon=lon, start_dt=start_h, end_dt=end_h, timezone=timezone
+        )
+
+    cache_key = (model.version, lat, lon, timezone, start_h)
+    weather_fetched_at = getattr(weather_map, "fetched_at", 0.0)
+    if cache is not None:
+        hit = cache.get(cache_key, hours, weather_fetched_at)
+        if hit is not None:
+            return hit, None
 
-    yhat = model_store.predict_one(feats)
+    return None, _plan(model, start_h, hours, weather_map, lag_provider, cache_key, weather_fetched_at)
 
-    return yhat, wp.__dict__, feats, warnings
+def _plan(
+    model,
+    start_h: datetime,
+    hours: int,
+    weather_map: WeatherBlock,
+    lag_provider: BaselineLagProvider,
+    cache_key: tuple,
+    weather_fetched_at: float,
+) -> _ForecastPlan:
+    ts_h = np.datetime64(start_h, "h") + np.arange(hours)
+    lag_needed = optional_lag_features(model.features)
+    # lag columns are placeholders here, recursive_forecast fills them step by step
+    lags_block = {k: np.zeros(hours) for k in lag_needed} if lag_needed else None
+    with timed("forecast.features"):
+        X = build_feature_matrix(ts_h, weather_map, lags_block, model.features)
+
+    warnings: List[str] = []
+    seed = None
+    if lag_needed:
+        with timed("forecast.lags"):
+            seed = seed_from_baseline(lag_provider, start_h)
+        warnings.append("Lags before start_datetime come from the baseline profile; later hours use recursive predictions.")
+
+    return _ForecastPlan(model, start_h, weather_map, X, seed, warnings, cache_key, weather_fetched_at)
 
 async def forecast_range(
     model_store: ModelStore,
@@ -66,27 +326,156 @@ async def forecast_range(
     timezone: str,
     start_dt: datetime,
     hours: int,
+    lag_provider: BaselineLagProvider,
+    inference: Optional[InferencePool] = None,
+    cache: Optional[ForecastCache] = None,
 ) -> Tuple[List[dict], List[str]]:
     """
-    Forecast many hours. For MVP: works only if model has no lags.
-    Later you can swap in recursive logic with lags provider.
+    Forecast many hours.
+    Models without lags are predicted in one batch; lag models run recursively,
+    seeded from the baseline profile for the 24h before start.
+    Results are memoized in cache, if given.
+    """
+    with timed("forecast.total"):
+        hit, plan = await _plan_forecast(
+            model_store, weather_client, lat, lon, timezone, start_dt, hours, lag_provider, cache
+        )
+        if hit is not None:
+            return hit
+
+        with timed("forecast.model"):
+            if plan.seed is not None:
+                # the whole recursive loop is one job, not one per step
+                yhat = await run_model(plan.model, inference, recursive_forecast, plan.X, plan.seed)
+            else:
+                # One ensemble pass over the whole horizon instead of one per hour.
+                yhat = await run_model(plan.model, inference, predict_matrix, plan.X)
+
+        with timed("forecast.response"):
+            preds = plan.points(0, yhat)
+        if cache is not None:
+            cache.put(plan.cache_key, plan.weather_fetched_at, preds, plan.warnings)
+
+        return preds, plan.warnings
+
+async def forecast_stream(
+    model_store: ModelStore,
+    weather_client: WeatherClient,
+    lat: float,
+    lon: float,
+    timezone: str,
+    start_dt: datetime,
+    hours: int,
+    lag_provider: BaselineLagProvider,
+    inference: Optional[InferencePool] = None,
+    cache: Optional[ForecastCache] = None,
+) -> Tuple[List[str], AsyncIterator[List[dict]]]:
+    """
+    forecast_range that hands out hours as they are computed.
+    Weather, features and validation happen before this returns (so errors can
+    still become a normal HTTP error); the iterator then yields the forecast in
+    chunks. Recursive models run in chunks of STREAM_FIRST_CHUNK_HOURS, doubling
+    up to STREAM_MAX_CHUNK_HOURS, so the first hour goes out after one step.
+    The full result is cached once the iterator is exhausted.
+    """
+    hit, plan = await _plan_forecast(
+        model_store, weather_client, lat, lon, timezone, start_dt, hours, lag_provider, cache
+    )
+    if hit is not None:
+        preds, warnings = hit
+
+        async def cached() -> AsyncIterator[List[dict]]:
+            yield preds
+
+        return warnings, cached()
+
+    async def computed() -> AsyncIterator[List[dict]]:
+        preds: List[dict] = []
+        if plan.seed is None:
+            yhat = await run_model(plan.model, inference, predict_matrix, plan.X)
+            preds = plan.points(0, yhat)
+            yield preds
+        else:
+            ring = LagRing(plan.seed)
+            done, size = 0, STREAM_FIRST_CHUNK_HOURS
+            while done < hours:
+                X = plan.X[done:done + size]
+                yhat, ring = await run_model(plan.model, inference, recursive_forecast_chunk, X, ring)
+                chunk = plan.points(done, yhat)
+                preds.extend(chunk)
+                done += len(X)
+                size = min(size * 2, STREAM_MAX_CHUNK_HOURS)
+                yield chunk
+        if cache is not None:
+            cache.put(plan.cache_key, plan.weather_fetched_at, preds, plan.warnings)
+
+    return plan.warnings, computed()
+
+async def forecast_multi(
+    model_store: ModelStore,
+    weather_client: WeatherClient,
+    zones: List[Zone],
+    lag_providers: List[BaselineLagProvider],
+    start_dt: datetime,
+    hours: int,
+    inference: Optional[InferencePool] = None,
+    cache: Optional[ForecastCache] = None,
+) -> List[dict]:
+    """
+    forecast_range for many zones at once. Weather is fetched for all zones
+    concurrently; zones not answered from cache share one model call (one per
+    hour, in lockstep, for lag models). Returns one dict per zone, in order,
+    with "predictions", "warnings" and "error" (weather failures are per zone).
     """
-    warnings: List[str] = []
     start_h = floor_to_hour(start_dt)
+    model = model_store.current()
     end_h = start_h + timedelta(hours=hours)
 
-    weather_map = await weather_client.fetch_hourly_map(
-        lat=lat, lon=lon, start_dt=start_h, end_dt=end_h, timezone=timezone
+    fetched = await asyncio.gather(
+        *[
+            weather_client.fetch_hourly_map(
+                lat=z.latitude, lon=z.longitude, start_dt=start_h, end_dt=end_h, timezone=z.timezone
+            )
+            for z in zones
+        ],
+        return_exceptions=True,
     )
 
-    preds: List[dict] = []
-    for i in range(hours):
-        ts = start_h + timedelta(hours=i)
-        wp = weather_map.get(ts)
-        if wp is None:
-            raise ValueError(f"No weather for hour {ts}.")
-        feats = build_features(ts, model_store.features, wp, lags=None)
-        yhat = model_store.predict_one(feats)
-        preds.append({"datetime": ts, "demand": yhat, "weather_used": wp.__dict__})
+    results: List[dict] = [{"predictions": None, "warnings": [], "error": None} for _ in zones]
+    plans: List[Tuple[int, _ForecastPlan]] = []
+    for i, (zone, lag_provider, weather_map) in enumerate(zip(zones, lag_providers, fetched)):
+        if isinstance(weather_map, Exception):
+            results[i]["error"] = f"Weather fetch failed: {weather_map}"
+            continue
+        cache_key = (model.version, zone.latitude, zone.longitude, zone.timezone, start_h, zone.zone_id)
+        weather_fetched_at = getattr(weather_map, "fetched_at", 0.0)
+        if cache is not None:
+            hit = cache.get(cache_key, hours, weather_fetched_at)
+            if hit is not None:
+                results[i]["predictions"], results[i]["warnings"] = hit
+                continue
+        try:
+            plan = _plan(model, start_h, hours, weather_map, lag_provider, cache_key, weather_fetched_at)
+        except ValueError as e:
+            results[i]["error"] = str(e)
+            continue
+        plans.append((i, plan))
+
+    if not plans:
+        return results
+
+    # (hours, zones, features): each lockstep step reads contiguous rows
+    X = np.stack([plan.X for _, plan in plans], axis=1)
+    if plans[0][1].seed is not None:
+        Y = await run_model(model, inference, recursive_forecast_multi, X, [plan.seed for _, plan in plans])
+    else:
+        flat = await run_model(model, inference, predict_matrix, X.reshape(-1, X.shape[2]))
+        Y = flat.reshape(hours, len(plans)).T
+
+    for (i, plan), yhat in zip(plans, Y):
+        preds = plan.points(0, yhat)
+        results[i].update(predictions=preds, warnings=plan.warnings)
+        if cache is not None:
+            cache.put(plan.cache_key, plan.weather_fetched_at, preds, plan.warnings)
 
-    return preds, warnings
+    return results
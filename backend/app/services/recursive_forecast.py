@@ -0,0 +1,142 @@
+from __future__ import annotations
+from datetime import datetime, timedelta
+from typing import List, Sequence, Tuple
+
+import numpy as np
+
+from app.services.feature_builder import feature_layout
+from app.services.lag_provider import BaselineLagProvider
+from app.services.model_store import LoadedModel
+
+LAG_WINDOW = 24
+
+class LagRing:
+    """
+    Fixed-size ring buffer of the last LAG_WINDOW hourly values.
+    Keeps a running sum so lag_1, lag_24 and roll_24_mean are O(1) per step.
+    """
+    __slots__ = ("_buf", "_pos", "_sum")
+
+    def __init__(self, seed: Sequence[float]):
+        if len(seed) != LAG_WINDOW:
+            raise ValueError(f"Need exactly {LAG_WINDOW} seed values (oldest first), got {len(seed)}.")
+        self._buf = [float(v) for v in seed]
+        # _pos points at the oldest value, i.e. the slot overwritten by the next push
+        self._pos = 0
+        self._sum = float(sum(self._buf))
+
+    def lag(self, k: int) -> float:
+        """Value k hours back (1 = most recent, LAG_WINDOW = oldest)."""
+        return self._buf[(self._pos - k) % LAG_WINDOW]
+
+    def mean(self) -> float:
+        return self._sum / LAG_WINDOW
+
+    def push(self, value: float) -> None:
+        self._sum += value - self._buf[self._pos]
+        self._buf[self._pos] = value
+        self._pos = (self._pos + 1) % LAG_WINDOW
+
+def recursive_forecast(
+    model: LoadedModel,
+    X: np.ndarray,
+    seed: Sequence[float],
+) -> np.ndarray:
+    """
+    Forecast len(X) consecutive hours, feeding each prediction back as lag input.
+    X comes from build_feature_matrix with calendar and weather columns filled
+    (they don't depend on earlier predictions); its lag columns are overwritten
+    step by step. seed holds demand for the LAG_WINDOW hours before the first
+    row, oldest first.
+    """
+    return _recurse(model, X, LagRing(seed))
+
+def recursive_forecast_chunk(
+    model: LoadedModel,
+    X: np.ndarray,
+    ring: LagRing,
+) -> Tuple[np.ndarray, LagRing]:
+    """
+    recursive_forecast for the next len(X) hours, continuing from ring.
+    Returns the predictions and the advanced ring (a copy when run in a
+    worker process), so consecutive chunks give exactly the one-shot result.
+    """
+    out = _recurse(model, X, ring)
+    return out, ring
+
+def _recurse(model: LoadedModel, X: np.ndarray, ring: LagRing) -> np.ndarray:
+    hours = len(X)
+    X = np.array(X, dtype=np.float64)
+
+    lag_cols = dict(feature_layout(model.features).lags)
+    i_lag1 = lag_cols.get("lag_1")
+    i_lag24 = lag_cols.get("lag_24")
+    i_roll = lag_cols.get("roll_24_mean")
+
+    out = np.empty(hours, dtype=np.float64)
+    for i in range(hours):
+        row = X[i]
+        if i_lag1 is not None:
+            row[i_lag1] = ring.lag(1)
+        if i_lag24 is not None:
+            row[i_lag24] = ring.lag(LAG_WINDOW)
+        if i_roll is not None:
+            row[i_roll] = ring.mean()
+
+        y = float(model.predict_batch(X[i:i + 1])[0])
+        # guard against odd values, same as the offline script
+        if y < 0:
+            y = 0.0
+        out[i] = y
+        ring.push(y)
+
+    return out
+
+def recursive_forecast_multi(
+    model: LoadedModel,
+    X: np.ndarray,
+    seeds: Sequence[Sequence[float]],
+) -> np.ndarray:
+    """
+    recursive_forecast for many series in lockstep: X is (hours, n_series,
+    n_features), hour-major so each step's rows are contiguous, and every
+    step is one predict_batch over all series. seeds holds one LAG_WINDOW
+    seed per series. Returns (n_series, hours); each series matches what
+    recursive_forecast gives for it alone.
+    """
+    hours, n = X.shape[0], X.shape[1]
+    X = np.array(X, dtype=np.float64)
+    buf = np.array(seeds, dtype=np.float64).reshape(n, -1)
+    if buf.shape[1] != LAG_WINDOW:
+        raise ValueError(f"Need exactly {LAG_WINDOW} seed values per series, got {buf.shape[1]}.")
+    # same summation order as LagRing, so rolling means match bit for bit
+    sums = np.array([float(sum(s)) for s in buf.tolist()])
+
+    lag_cols = dict(feature_layout(model.features).lags)
+    i_lag1 = lag_cols.get("lag_1")
+    i_lag24 = lag_cols.get("lag_24")
+    i_roll = lag_cols.get("roll_24_mean")
+
+    out = np.empty((hours, n), dtype=np.float64)
+    pos = 0  # column of the oldest value, as LagRing._pos
+    for t in range(hours):
+        rows = X[t]
+        if i_lag1 is not None:
+            rows[:, i_lag1] = buf[:, (pos - 1) % LAG_WINDOW]
+        if i_lag24 is not None:
+            rows[:, i_lag24] = buf[:, pos]
+        if i_roll is not None:
+            rows[:, i_roll] = sums / LAG_WINDOW
+
+        y = model.predict_batch(rows)
+        y = np.where(y < 0, 0.0, y)
+        out[t] = y
+        sums += y - buf[:, pos]
+        buf[:, pos] = y
+        pos = (pos + 1) % LAG_WINDOW
+
+    return out.T.copy()
+
+def seed_from_baseline(lag_provider: BaselineLagProvider, start_h: datetime) -> List[float]:
+    """Baseline demand for the LAG_WINDOW hours before start_h, oldest first."""
+    return [lag_provider.mean_for(start_h - timedelta(hours=k)) for k in range(LAG_WINDOW, 0, -1)]
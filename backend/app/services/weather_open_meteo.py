@@ -1,25 +1,294 @@
 from __future__ import annotations
-from dataclasses import dataclass
-from datetime import datetime, date
-from typing import Dict, Tuple
+import asyncio
+import logging
+from collections import OrderedDict
+from datetime import datetime, date, timedelta
+from typing import Dict, List, Optional, Set, Tuple
 
 import httpx
-import pandas as pd
+import numpy as np
+
+from app.services.metrics import timed
 
 OPEN_METEO_URL = "https://api.open-meteo.com/v1/forecast"
 
-@dataclass(frozen=True)
+log = logging.getLogger(__name__)
+
+# Model feature name -> Open-Meteo hourly variable
+OPEN_METEO_FIELDS = {
+    "temp": "temperature_2m",
+    "rhum": "relativehumidity_2m",
+    "prcp": "precipitation",
+    "wspd": "windspeed_10m",
+    "pres": "pressure_msl",
+}
+WEATHER_FIELDS = tuple(OPEN_METEO_FIELDS)
+
+_EPOCH = datetime(1970, 1, 1)
+
+def epoch_hour(dt: datetime) -> int:
+    """Whole hours since 1970-01-01 for a naive (wall clock) datetime."""
+    delta = dt - _EPOCH
+    return delta.days * 24 + delta.seconds // 3600
+
+def day_start_hour(d: date) -> int:
+    return (d - _EPOCH.date()).days * 24
+
 class WeatherPoint:
-    temp: float
-    rhum: float
-    prcp: float
-    wspd: float
-    pres: float
+    """Weather for a single hour."""
+    __slots__ = WEATHER_FIELDS
+
+    def __init__(self, temp: float, rhum: float, prcp: float, wspd: float, pres: float):
+        self.temp = temp
+        self.rhum = rhum
+        self.prcp = prcp
+        self.wspd = wspd
+        self.pres = pres
+
+    def as_dict(self) -> Dict[str, float]:
+        return {f: getattr(self, f) for f in WEATHER_FIELDS}
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, WeatherPoint) and self.as_dict() == other.as_dict()
+
+    def __repr__(self) -> str:
+        return "WeatherPoint(" + ", ".join(f"{f}={getattr(self, f)!r}" for f in WEATHER_FIELDS) + ")"
+
+class WeatherBlock:
+    """
+    Hourly weather for a contiguous run of hours, stored column-wise.
+    Row i is epoch hour start + i; hours upstream did not return are NaN.
+    """
+    __slots__ = ("start", "hours", "temp", "rhum", "prcp", "wspd", "pres", "fetched_at")
+
+    def __init__(
+        self,
+        start: int,
+        temp: np.ndarray,
+        rhum: np.ndarray,
+        prcp: np.ndarray,
+        wspd: np.ndarray,
+        pres: np.ndarray,
+        hours: Optional[np.ndarray] = None,
+        fetched_at: float = 0.0,
+    ):
+        self.start = int(start)
+        self.temp = temp
+        self.rhum = rhum
+        self.prcp = prcp
+        self.wspd = wspd
+        self.pres = pres
+        self.hours = np.arange(self.start, self.start + len(temp), dtype=np.int64) if hours is None else hours
+        # fetch time of the most recently fetched day in the block (0 = unknown)
+        self.fetched_at = fetched_at
+
+    @classmethod
+    def empty(cls, start: int, n: int) -> "WeatherBlock":
+        cols = {f: np.full(n, np.nan, dtype=np.float64) for f in WEATHER_FIELDS}
+        return cls(start, **cols)
+
+    @classmethod
+    def from_open_meteo(cls, hourly: dict) -> "WeatherBlock":
+        """Build from an Open-Meteo "hourly" payload; gaps in the time axis become NaN."""
+        hours = np.array(hourly["time"], dtype="datetime64[h]").astype(np.int64)
+        if hours.size == 0:
+            return cls.empty(0, 0)
+        cols = {f: np.array(hourly[k], dtype=np.float64) for f, k in OPEN_METEO_FIELDS.items()}
+        start = int(hours.min())
+        n = int(hours.max()) - start + 1
+        if n == hours.size and (np.diff(hours) == 1).all():
+            return cls(start, hours=hours, **cols)
+        block = cls.empty(start, n)
+        for f, values in cols.items():
+            getattr(block, f)[hours - start] = values
+        return block
+
+    @classmethod
+    def concat(cls, blocks: List["WeatherBlock"], start: int, end: int) -> "WeatherBlock":
+        """Copy blocks into one new block spanning [start, end); uncovered hours are NaN."""
+        out = cls.empty(start, end - start)
+        for b in blocks:
+            lo, hi = max(b.start, start), min(b.end, end)
+            if lo >= hi:
+                continue
+            for f in WEATHER_FIELDS:
+                getattr(out, f)[lo - start:hi - start] = getattr(b, f)[lo - b.start:hi - b.start]
+        return out
+
+    @property
+    def end(self) -> int:
+        return self.start + len(self.temp)
+
+    def __len__(self) -> int:
+        return len(self.temp)
+
+    def column(self, name: str) -> np.ndarray:
+        return getattr(self, name)
+
+    def slice(self, start: int, end: int) -> "WeatherBlock":
+        """Rows for epoch hours [start, end) as views, no copy."""
+        lo = min(max(start, self.start), self.end) - self.start
+        hi = min(max(end, self.start), self.end) - self.start
+        hi = max(lo, hi)
+        return WeatherBlock(
+            self.start + lo,
+            hours=self.hours[lo:hi],
+            fetched_at=self.fetched_at,
+            **{f: getattr(self, f)[lo:hi] for f in WEATHER_FIELDS},
+        )
+
+    def get(self, dt: datetime) -> Optional[WeatherPoint]:
+        """WeatherPoint for the hour of naive dt, None if not held or any field is null upstream."""
+        if dt.tzinfo is not None:
+            return None
+        i = epoch_hour(dt) - self.start
+        if i < 0 or i >= len(self.temp):
+            return None
+        values = [float(getattr(self, f)[i]) for f in WEATHER_FIELDS]
+        if any(v != v for v in values):
+            return None
+        return WeatherPoint(*values)
+
+def merge_day_ranges(days: List[date]) -> List[Tuple[date, date]]:
+    """Collapse sorted days into inclusive (first, last) runs of consecutive days."""
+    ranges: List[Tuple[date, date]] = []
+    for d in days:
+        if ranges and d - ranges[-1][1] == timedelta(days=1):
+            ranges[-1] = (ranges[-1][0], d)
+        else:
+            ranges.append((d, d))
+    return ranges
+
+class _LocationStore:
+    """
+    Hour-granular weather for one (lat, lon, timezone).
+    Hours live in a few contiguous WeatherBlock segments (merged as gaps are
+    filled), so a range inside one segment is served as array views.
+    Upstream is queried by date, so fetch times are tracked per day.
+    """
+
+    def __init__(self):
+        # disjoint, sorted by start, each spanning whole days
+        self.segments: List[WeatherBlock] = []
+        # day -> fetch time
+        self.days: Dict[date, float] = {}
+        # day -> fetch currently filling it
+        self.inflight: Dict[date, asyncio.Task] = {}
+
+    def age(self, d: date, now: float) -> Optional[float]:
+        """Seconds since day d was fetched, None if not held."""
+        fetched_at = self.days.get(d)
+        return None if fetched_at is None else now - fetched_at
+
+    def drop(self, d: date) -> None:
+        if self.days.pop(d, None) is None:
+            return
+        lo = day_start_hour(d)
+        hi = lo + 24
+        segments: List[WeatherBlock] = []
+        for seg in self.segments:
+            if seg.end <= lo or seg.start >= hi:
+                segments.append(seg)
+                continue
+            # copy the remainders so the evicted hours' memory is released
+            if seg.start < lo:
+                segments.append(WeatherBlock.concat([seg], seg.start, lo))
+            if seg.end > hi:
+                segments.append(WeatherBlock.concat([seg], hi, seg.end))
+        self.segments = segments
+
+    def put(self, fetched_at: float, first: date, last: date, block: WeatherBlock) -> None:
+        lo = day_start_hour(first)
+        hi = day_start_hour(last) + 24
+        pieces = [block.slice(lo, hi)]
+        keep: List[WeatherBlock] = []
+        for seg in self.segments:
+            if seg.end < lo or seg.start > hi:
+                keep.append(seg)
+                continue
+            # overlapping or adjacent: fold whatever lies outside [lo, hi) into the new segment
+            if seg.start < lo:
+                pieces.append(seg.slice(seg.start, lo))
+            if seg.end > hi:
+                pieces.append(seg.slice(hi, seg.end))
+        start = min([lo] + [p.start for p in pieces if len(p)])
+        end = max([hi] + [p.end for p in pieces if len(p)])
+        keep.append(WeatherBlock.concat(pieces, start, end))
+        self.segments = sorted(keep, key=lambda seg: seg.start)
+
+        d = first
+        while d <= last:
+            self.days[d] = fetched_at
+            d += timedelta(days=1)
+
+    def collect(self, days: List[date]) -> WeatherBlock:
+        lo = day_start_hour(days[0])
+        hi = day_start_hour(days[-1]) + 24
+        fetched_at = max((self.days.get(d, 0.0) for d in days), default=0.0)
+        for seg in self.segments:
+            if seg.start <= lo and seg.end >= hi:
+                block = seg.slice(lo, hi)
+                break
+        else:
+            block = WeatherBlock.concat(self.segments, lo, hi)
+        block.fetched_at = fetched_at
+        return block
 
 class WeatherClient:
-    def __init__(self, ttl_seconds: int = 900):
+    def __init__(
+        self,
+        ttl_seconds: int = 900,
+        max_connections: int = 20,
+        max_days: int = 2048,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+        url: str = OPEN_METEO_URL,
+    ):
         self.ttl = ttl_seconds
-        self._cache: Dict[Tuple, Tuple[float, Dict[pd.Timestamp, WeatherPoint]]] = {}
+        self.url = url
+        self.max_days = max_days
+        # (lat, lon, timezone) -> hours held for that location
+        self._stores: Dict[Tuple, _LocationStore] = {}
+        # (location key, day) in least -> most recently used order
+        self._lru: "OrderedDict[Tuple[Tuple, date], None]" = OrderedDict()
+        # (location key, day) -> number of requests that have yet to collect it
+        self._pinned: Dict[Tuple[Tuple, date], int] = {}
+        self._refreshing: Set[asyncio.Task] = set()
+        self._stats = {
+            "hits": 0,
+            "stale_hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "refreshes": 0,
+            "upstream_requests": 0,
+            "upstream_errors": 0,
+        }
+        self._limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_connections,
+        )
+        # transport is injectable so tests can use httpx.MockTransport
+        self._transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+
+    async def start(self) -> None:
+        """Open the pooled HTTP client (called from the app lifespan)."""
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=15,
+                limits=self._limits,
+                transport=self._transport,
+            )
+
+    async def aclose(self) -> None:
+        for task in list(self._refreshing):
+            task.cancel()
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def stats(self) -> Dict[str, int]:
+        """Cache counters (per day of weather) plus current size."""
+        return {**self._stats, "days_cached": len(self._lru), "max_days": self.max_days}
 
     async def fetch_hourly_map(
         self,
@@ -28,54 +297,188 @@ class WeatherClient:
         start_dt: datetime,
         end_dt: datetime,
         timezone: str,
-    ) -> Dict[pd.Timestamp, WeatherPoint]:
+    ) -> WeatherBlock:
         """
-        1 request for [start_date..end_date] inclusive, returns hourly map.
-        Caches by (lat, lon, start_date, end_date, timezone).
+        Returns hourly weather for [start_date..end_date] inclusive.
+        Served from the per-location hour store; only missing days are fetched,
+        as merged date ranges, and concurrent misses for the same day wait on a
+        single in-flight request. Expired days are served as-is while one
+        background task refreshes them.
         """
-        import time
+        with timed("weather.fetch"):
+            return await self._from_store(lat, lon, start_dt, end_dt, timezone)
+
+    async def _from_store(
+        self,
+        lat: float,
+        lon: float,
+        start_dt: datetime,
+        end_dt: datetime,
+        timezone: str,
+    ) -> WeatherBlock:
         start_date = start_dt.date()
         end_date = end_dt.date()
-        key = (lat, lon, start_date.isoformat(), end_date.isoformat(), timezone)
+        days = [start_date + timedelta(days=i) for i in range((end_date - start_date).days + 1)]
+        if len(days) > self.max_days:
+            raise ValueError(
+                f"Weather span of {len(days)} days exceeds the cache limit of {self.max_days} days."
+            )
+
+        loc = (lat, lon, timezone)
+        keys = [(loc, d) for d in days]
+        for key in keys:
+            self._pinned[key] = self._pinned.get(key, 0) + 1
+        try:
+            return await self._collect(loc, days, keys)
+        finally:
+            for key in keys:
+                left = self._pinned[key] - 1
+                if left:
+                    self._pinned[key] = left
+                else:
+                    del self._pinned[key]
+            self._evict()
+
+    async def _collect(self, loc: Tuple, days: List[date], keys: List[Tuple[Tuple, date]]) -> WeatherBlock:
+        import time
+        store = self._stores.get(loc)
+        if store is None:
+            store = self._stores[loc] = _LocationStore()
 
         now = time.time()
-        if key in self._cache:
-            ts_cached, data = self._cache[key]
-            if now - ts_cached < self.ttl:
-                return data
+        waiting: Set[asyncio.Task] = set()
+        missing: List[date] = []
+        stale: List[date] = []
+        for d in days:
+            age = store.age(d, now)
+            if age is None:
+                task = store.inflight.get(d)
+                if task is not None:
+                    waiting.add(task)
+                else:
+                    missing.append(d)
+                self._stats["misses"] += 1
+            elif age < self.ttl:
+                self._stats["hits"] += 1
+            else:
+                if d not in store.inflight:
+                    stale.append(d)
+                self._stats["stale_hits"] += 1
 
+        for first, last in merge_day_ranges(missing):
+            waiting.add(self._start_fetch(store, loc, first, last))
+
+        # stale-while-revalidate: answer now, refresh in the background
+        for first, last in merge_day_ranges(stale):
+            task = self._start_fetch(store, loc, first, last)
+            self._stats["refreshes"] += 1
+            self._refreshing.add(task)
+            task.add_done_callback(self._refresh_done)
+
+        if waiting:
+            # shield: a cancelled caller must not cancel fetches other callers wait on
+            await asyncio.shield(asyncio.gather(*waiting))
+
+        for key in keys:
+            if key in self._lru:
+                self._lru.move_to_end(key)
+
+        return store.collect(days)
+
+    def _start_fetch(self, store: _LocationStore, loc: Tuple, first: date, last: date) -> asyncio.Task:
+        lat, lon, timezone = loc
+        task = asyncio.ensure_future(self._fetch_into(store, loc, lat, lon, first, last, timezone))
+        gap = [first + timedelta(days=i) for i in range((last - first).days + 1)]
+        for d in gap:
+            store.inflight[d] = task
+        task.add_done_callback(lambda t: self._clear_inflight(store, gap, t))
+        return task
+
+    @staticmethod
+    def _clear_inflight(store: _LocationStore, days: List[date], task: asyncio.Task) -> None:
+        for d in days:
+            if store.inflight.get(d) is task:
+                del store.inflight[d]
+
+    def _refresh_done(self, task: asyncio.Task) -> None:
+        self._refreshing.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            # keep serving the stale days; the next request retries
+            log.warning("Background weather refresh failed: %s", task.exception())
+
+    async def _fetch_into(
+        self,
+        store: _LocationStore,
+        loc: Tuple,
+        lat: float,
+        lon: float,
+        first: date,
+        last: date,
+        timezone: str,
+    ) -> None:
+        import time
+        self._stats["upstream_requests"] += 1
+        try:
+            block = await self._fetch_range(lat, lon, first, last, timezone)
+        except Exception:
+            self._stats["upstream_errors"] += 1
+            raise
+        store.put(time.time(), first, last, block)
+
+        d = first
+        while d <= last:
+            self._lru[(loc, d)] = None
+            self._lru.move_to_end((loc, d))
+            d += timedelta(days=1)
+        self._evict()
+
+    def _evict(self) -> None:
+        """
+        Drop least recently used days down to max_days, skipping days a pending
+        request still has to collect (the cache may overshoot until it has).
+        """
+        excess = len(self._lru) - self.max_days
+        if excess <= 0:
+            return
+        for key in list(self._lru):
+            if excess <= 0:
+                break
+            if key in self._pinned:
+                continue
+            del self._lru[key]
+            excess -= 1
+            loc, d = key
+            store = self._stores.get(loc)
+            if store is None:
+                continue
+            store.drop(d)
+            self._stats["evictions"] += 1
+            if not store.days and not store.inflight:
+                del self._stores[loc]
+
+    async def _fetch_range(
+        self,
+        lat: float,
+        lon: float,
+        start_date: date,
+        end_date: date,
+        timezone: str,
+    ) -> WeatherBlock:
         params = {
             "latitude": lat,
             "longitude": lon,
-            "hourly": ",".join([
-                "temperature_2m",
-                "relativehumidity_2m",
-                "precipitation",
-                "windspeed_10m",
-                "pressure_msl",
-            ]),
+            "hourly": ",".join(OPEN_METEO_FIELDS.values()),
             "start_date": start_date.isoformat(),
             "end_date": end_date.isoformat(),
             "timezone": timezone,
         }
 
-        async with httpx.AsyncClient(timeout=15) as client:
-            r = await client.get(OPEN_METEO_URL, params=params)
+        if self._client is None:
+            await self.start()
+        with timed("weather.upstream"):
+            r = await self._client.get(self.url, params=params)
             r.raise_for_status()
-            payload = r.json()
 
-        hourly = payload["hourly"]
-        times = pd.to_datetime(hourly["time"])
-
-        out: Dict[pd.Timestamp, WeatherPoint] = {}
-        for i, t in enumerate(times):
-            out[pd.Timestamp(t)] = WeatherPoint(
-                temp=float(hourly["temperature_2m"][i]),
-                rhum=float(hourly["relativehumidity_2m"][i]),
-                prcp=float(hourly["precipitation"][i]),
-                wspd=float(hourly["windspeed_10m"][i]),
-                pres=float(hourly["pressure_msl"][i]),
-            )
-
-        self._cache[key] = (now, out)
-        return out
+        with timed("weather.parse"):
+            payload = r.json()
+            return WeatherBlock.from_open_meteo(payload["hourly"])
@@ -0,0 +1,130 @@
+import json
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from app.services.lag_provider import BaselineLagProvider
+
+DEFAULT_ZONE = "default"
+
+class Zone:
+    """A forecast location: coordinates for weather plus the lag baseline it uses."""
+    __slots__ = ("zone_id", "latitude", "longitude", "timezone", "baseline_path")
+
+    def __init__(
+        self,
+        zone_id: str,
+        latitude: float,
+        longitude: float,
+        timezone: str,
+        baseline_path: Optional[str] = None,
+    ):
+        self.zone_id = zone_id
+        self.latitude = float(latitude)
+        self.longitude = float(longitude)
+        self.timezone = timezone
+        # None = the service-wide default baseline
+        self.baseline_path = baseline_path
+
+    def as_dict(self) -> dict:
+        return {
+            "zone": self.zone_id,
+            "latitude": self.latitude,
+            "longitude": self.longitude,
+            "timezone": self.timezone,
+            "baseline_path": self.baseline_path,
+        }
+
+class ZoneRegistry:
+    """
+    Known zones, read from a JSON file:
+
+        {"zones": [{"id": "jfk", "latitude": 40.64, "longitude": -73.78,
+                    "timezone": "America/New_York",
+                    "baseline_path": "artifacts/baselines/jfk.csv"}]}
+
+    Zone definitions are tiny; the per-zone lag baselines are loaded on first
+    use and kept in an LRU of max_baselines, so memory stays bounded however
+    many zones are registered. Zones without their own baseline (and ad-hoc
+    locations) share default_lags. Weather for every zone lives in the one
+    WeatherClient, whose day LRU is shared across locations.
+    """
+
+    def __init__(self, zones: List[Zone], default_lags: BaselineLagProvider, max_baselines: int = 64):
+        self._zones: Dict[str, Zone] = {z.zone_id: z for z in zones}
+        self.default_lags = default_lags
+        self.max_baselines = max_baselines
+        self._baselines: "OrderedDict[str, BaselineLagProvider]" = OrderedDict()
+        # baselines load in worker threads
+        self._lock = threading.Lock()
+        self.baseline_loads = 0
+        self.baseline_evictions = 0
+
+    @classmethod
+    def from_file(
+        cls,
+        path: str,
+        default_zone: Zone,
+        default_lags: BaselineLagProvider,
+        max_baselines: int = 64,
+    ) -> "ZoneRegistry":
+        """Registry of default_zone plus the zones in path (if the file exists)."""
+        zones = [default_zone]
+        p = Path(path)
+        if p.exists():
+            data = json.loads(p.read_text(encoding="utf-8"))
+            for z in data.get("zones", []):
+                try:
+                    zones.append(Zone(
+                        str(z["id"]), z["latitude"], z["longitude"], z["timezone"], z.get("baseline_path"),
+                    ))
+                except KeyError as e:
+                    raise ValueError(f"Zone entry {z} in {path} is missing {e}.")
+        return cls(zones, default_lags, max_baselines)
+
+    def __len__(self) -> int:
+        return len(self._zones)
+
+    def zones(self) -> List[Zone]:
+        return list(self._zones.values())
+
+    def get(self, zone_id: str) -> Zone:
+        zone = self._zones.get(zone_id)
+        if zone is None:
+            raise ValueError(f"Unknown zone {zone_id!r}.")
+        return zone
+
+    @staticmethod
+    def location(latitude: float, longitude: float, timezone: str) -> Zone:
+        """Ad-hoc zone for a request-level location (default baseline)."""
+        return Zone(f"{latitude},{longitude}", latitude, longitude, timezone)
+
+    def lag_provider(self, zone: Zone) -> BaselineLagProvider:
+        if zone.baseline_path is None:
+            return self.default_lags
+        with self._lock:
+            lags = self._baselines.get(zone.baseline_path)
+            if lags is not None:
+                self._baselines.move_to_end(zone.baseline_path)
+                return lags
+            lags = BaselineLagProvider(zone.baseline_path)
+            self.baseline_loads += 1
+            self._baselines[zone.baseline_path] = lags
+            while len(self._baselines) > self.max_baselines:
+                self._baselines.popitem(last=False)
+                self.baseline_evictions += 1
+            return lags
+
+    def lag_providers(self, zones: List[Zone]) -> List[BaselineLagProvider]:
+        """Baselines for zones, loading missing ones (blocking: call via asyncio.to_thread)."""
+        return [self.lag_provider(z) for z in zones]
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "zones": len(self._zones),
+            "baselines_loaded": len(self._baselines),
+            "max_baselines": self.max_baselines,
+            "baseline_loads": self.baseline_loads,
+            "baseline_evictions": self.baseline_evictions,
+        }
@@ -0,0 +1,308 @@
+"""
+End-to-end API benchmark. Starts the weather stub and a uvicorn worker with a
+synthetic model matching artifacts/feature_schema.json, then drives /predict
+and /forecast (24h and 168h) on their cache-hit and cache-miss paths at
+several concurrency levels, recording p50/p95/p99 latency and requests/s.
+
+    cd backend
+    python -m bench.api --out bench_results.json
+    python -m bench.api --requests 200 --concurrency 1 8 --compare bench_results.json
+
+Server settings come from the environment as usual (TAXI_COMPILED_INFERENCE=1,
+TAXI_INFERENCE_EXECUTOR=process, ...) and are recorded in the report.
+--compare exits 1 if any scenario's p95 or requests/s is more than
+--tolerance worse than in the given earlier report.
+
+Scenarios:
+  predict_hit          same hour every request: weather served from cache
+  predict_miss         a new day per request: weather fetched upstream (stub)
+  forecast_{h}_hit     same start every request: memoized forecast
+  forecast_{h}_miss    new start hour per request (weather pre-warmed): full model run
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Callable, Dict, List
+
+import httpx
+
+from bench import synthetic_model
+from bench.startup import BACKEND_DIR, free_port, read_log, server_log
+
+SCENARIOS = ("predict_hit", "predict_miss", "forecast_24_hit", "forecast_24_miss",
+             "forecast_168_hit", "forecast_168_miss")
+PERCENTILES = (50, 95, 99)
+
+
+def percentile(sorted_values: List[float], p: float) -> float:
+    """Nearest-rank percentile of an ascending list."""
+    if not sorted_values:
+        return float("nan")
+    k = max(0, min(len(sorted_values) - 1, math.ceil(p / 100.0 * len(sorted_values)) - 1))
+    return sorted_values[k]
+
+
+def summarize(name: str, concurrency: int, latencies: List[float], errors: int, wall: float) -> dict:
+    lat = sorted(latencies)
+    return {
+        "scenario": name,
+        "concurrency": concurrency,
+        "requests": len(latencies) + errors,
+        "errors": errors,
+        "rps": round(len(latencies) / wall, 2) if wall > 0 else 0.0,
+        "latency_ms": {
+            **{f"p{p}": round(percentile(lat, p) * 1000, 3) for p in PERCENTILES},
+            "mean": round(statistics.fmean(lat) * 1000, 3) if lat else float("nan"),
+            "max": round(lat[-1] * 1000, 3) if lat else float("nan"),
+        },
+    }
+
+
+async def drive(base: str, make_request: Callable[[int], tuple], n: int, concurrency: int) -> tuple:
+    """Send n requests with `concurrency` in flight; make_request(i) -> (path, json body)."""
+    latencies: List[float] = []
+    errors = 0
+    counter = iter(range(n))
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base, limits=limits, timeout=60.0) as client:
+        async def worker():
+            nonlocal errors
+            for i in counter:
+                path, body = make_request(i)
+                t0 = time.perf_counter()
+                try:
+                    r = await client.post(path, json=body)
+                    ok = r.status_code == 200
+                except httpx.HTTPError:
+                    ok = False
+                dt = time.perf_counter() - t0
+                if ok:
+                    latencies.append(dt)
+                else:
+                    errors += 1
+
+        t0 = time.perf_counter()
+        await asyncio.gather(*[worker() for _ in range(concurrency)])
+        wall = time.perf_counter() - t0
+    return latencies, errors, wall
+
+
+def scenario_requests(name: str, base_hour: datetime, run: int) -> Callable[[int], tuple]:
+    """
+    Request factory for one (scenario, concurrency) run. `run` shifts the miss
+    scenarios to hours/days no earlier run touched, so they stay misses.
+    """
+    if name == "predict_hit":
+        return lambda i: ("/predict", {"target_datetime": base_hour.isoformat()})
+    if name == "predict_miss":
+        # walk backwards one day per request, away from the pre-warmed forecast range
+        origin = base_hour - timedelta(days=(run + 1) * 10_000)
+        return lambda i: ("/predict", {"target_datetime": (origin - timedelta(days=i)).isoformat()})
+
+    _, hours, kind = name.split("_")
+    hours = int(hours)
+    if kind == "hit":
+        return lambda i: ("/forecast", {"start_datetime": base_hour.isoformat(), "hours": hours})
+    origin = base_hour + timedelta(hours=run * 10_000)
+    return lambda i: ("/forecast", {"start_datetime": (origin + timedelta(hours=i)).isoformat(), "hours": hours})
+
+
+async def prewarm(base: str, base_hour: datetime, runs: int, n: int) -> None:
+    """Fetch weather for every hour a forecast_*_miss run will touch, so only the forecast misses."""
+    async with httpx.AsyncClient(base_url=base, timeout=120.0) as client:
+        for run in range(runs):
+            origin = base_hour + timedelta(hours=run * 10_000)
+            for offset in range(0, n + 168, 168):
+                start = origin + timedelta(hours=offset - 1)
+                r = await client.post("/forecast", json={"start_datetime": start.isoformat(), "hours": 168})
+                r.raise_for_status()
+
+
+def start_server(env: dict, timeout: float = 120.0) -> tuple:
+    port = free_port()
+    # the child keeps its own handle to the log; ours is only for reading it on failure
+    with server_log() as log:
+        proc = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+            cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=log,
+        )
+        base = f"http://127.0.0.1:{port}"
+        t0 = time.perf_counter()
+        while True:
+            if proc.poll() is not None:
+                raise RuntimeError(f"Server exited: {read_log(log)}")
+            try:
+                if httpx.get(base + "/health", timeout=2.0).status_code == 200:
+                    return proc, base
+            except httpx.TransportError:
+                pass
+            if time.perf_counter() - t0 > timeout:
+                proc.kill()
+                raise TimeoutError("Server did not become healthy")
+            time.sleep(0.05)
+
+
+def start_stub(latency_ms: float) -> tuple:
+    port = free_port()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "bench.weather_stub", "--port", str(port), "--latency-ms", str(latency_ms)],
+        cwd=BACKEND_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    url = f"http://127.0.0.1:{port}/v1/forecast"
+    for _ in range(200):
+        try:
+            httpx.get(url, params={"start_date": "2026-01-01", "end_date": "2026-01-01"}, timeout=1.0)
+            return proc, url
+        except httpx.TransportError:
+            time.sleep(0.05)
+    proc.kill()
+    raise TimeoutError("Weather stub did not start")
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def compare(report: dict, previous: dict, tolerance: float) -> List[str]:
+    """Scenarios whose p95 grew or rps dropped by more than tolerance (fraction)."""
+    before = {(r["scenario"], r["concurrency"]): r for r in previous["results"]}
+    regressions = []
+    for r in report["results"]:
+        old = before.get((r["scenario"], r["concurrency"]))
+        if old is None:
+            continue
+        label = f"{r['scenario']} @{r['concurrency']}"
+        p95, old_p95 = r["latency_ms"]["p95"], old["latency_ms"]["p95"]
+        if old_p95 > 0 and p95 > old_p95 * (1 + tolerance):
+            regressions.append(f"{label}: p95 {old_p95:.2f} -> {p95:.2f} ms")
+        if old["rps"] > 0 and r["rps"] < old["rps"] * (1 - tolerance):
+            regressions.append(f"{label}: rps {old['rps']:.1f} -> {r['rps']:.1f}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=500, help="requests per scenario and concurrency level")
+    parser.add_argument("--miss-requests", type=int, default=50,
+                        help="requests per run for forecast_*_miss (each one is a full model run)")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--trees", type=int, default=synthetic_model.N_ESTIMATORS)
+    parser.add_argument("--model-dir", type=Path, help="reuse/keep the synthetic model here (default: temp dir)")
+    parser.add_argument("--model-format", choices=("joblib", "flat"), default="joblib")
+    parser.add_argument("--stub-latency-ms", type=float, default=20.0,
+                        help="simulated Open-Meteo round trip on weather misses")
+    parser.add_argument("--out", type=Path, help="write the JSON report here")
+    parser.add_argument("--compare", type=Path, help="earlier report to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        model_dir = args.model_dir or Path(tmp)
+        model_info_path = model_dir / "synthetic.json"
+        if model_info_path.exists():
+            model_info = json.loads(model_info_path.read_text(encoding="utf-8"))
+        else:
+            print(f"Training synthetic model ({args.trees} trees) ...", file=sys.stderr)
+            model_info = synthetic_model.build(model_dir, n_estimators=args.trees, flat=True)
+            model_info_path.write_text(json.dumps(model_info, indent=2), encoding="utf-8")
+
+        stub, weather_url = start_stub(args.stub_latency_ms)
+        env = dict(
+            os.environ,
+            PYTHONPATH=str(BACKEND_DIR),
+            TAXI_WEATHER_URL=weather_url,
+            TAXI_SCHEMA_PATH=model_info["schema_path"],
+            TAXI_MODEL_FORMAT=args.model_format,
+            TAXI_MODEL_PATH=model_info["flat_path" if args.model_format == "flat" else "model_path"],
+        )
+        try:
+            server, base = start_server(env)
+            try:
+                results = run_all(base, args)
+                model = httpx.get(base + "/model-info").json()
+                stats = httpx.get(base + "/stats").json()
+            finally:
+                server.terminate()
+                server.wait(timeout=10)
+        finally:
+            stub.terminate()
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "git_commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "requests_per_run": args.requests,
+            "forecast_miss_requests_per_run": args.miss_requests,
+            "stub_latency_ms": args.stub_latency_ms,
+            "settings_env": {k: v for k, v in env.items() if k.startswith("TAXI_")},
+            "model": {
+                "version": model["version"],
+                "compiled": model["compiled"],
+                "n_estimators": model_info["n_estimators"],
+                "n_nodes": model_info["n_nodes"],
+            },
+            "server_stats": stats,
+        },
+        "results": results,
+    }
+
+    text = json.dumps(report, indent=2)
+    if args.out:
+        args.out.write_text(text + "\n", encoding="utf-8")
+    for r in results:
+        lat = r["latency_ms"]
+        print(f"{r['scenario']:>18} c={r['concurrency']:<3} rps={r['rps']:>9.1f}  "
+              f"p50={lat['p50']:>8.2f}  p95={lat['p95']:>8.2f}  p99={lat['p99']:>8.2f} ms  errors={r['errors']}")
+
+    if args.compare:
+        regressions = compare(report, json.loads(args.compare.read_text(encoding="utf-8")), args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION: {line}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+def run_all(base: str, args) -> List[dict]:
+    base_hour = (datetime.now() + timedelta(days=1)).replace(minute=0, second=0, microsecond=0)
+    levels = args.concurrency
+    if any(s.startswith("forecast") and s.endswith("miss") for s in args.scenarios):
+        asyncio.run(prewarm(base, base_hour, len(levels) * 2, args.miss_requests))
+
+    results: List[Dict] = []
+    for name in args.scenarios:
+        # one untimed request so hit scenarios start warm
+        make = scenario_requests(name, base_hour, 0)
+        if name.endswith("hit"):
+            asyncio.run(drive(base, make, 1, 1))
+        for level_idx, concurrency in enumerate(levels):
+            # forecast_24_miss and forecast_168_miss must not share start hours
+            run = level_idx + (len(levels) if name == "forecast_168_miss" else 0)
+            make = scenario_requests(name, base_hour, run)
+            n = args.miss_requests if name.startswith("forecast") and name.endswith("miss") else args.requests
+            latencies, errors, wall = asyncio.run(drive(base, make, n, concurrency))
+            results.append(summarize(name, concurrency, latencies, errors, wall))
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""
+Cold-start benchmark: spawn a fresh uvicorn worker and time
+  - import of app.main (and which heavy modules it drags in),
+  - time to first healthy response (/health answers once the lifespan ran),
+  - time to first /predict.
+Medians over --runs are checked against bench/startup_budget.json; exits 1 on
+regression. Weather comes from bench.weather_stub, never the real API.
+
+    cd backend
+    python -m bench.startup --runs 5
+    TAXI_MODEL_FORMAT=flat TAXI_MODEL_PATH=artifacts/rf_model_flat python -m bench.startup
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import httpx
+
+from bench.weather_stub import WeatherStub
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+BUDGET_PATH = Path(__file__).resolve().parent / "startup_budget.json"
+
+# Must not be imported by `import app.main`: they belong to training / model loading.
+FORBIDDEN_AT_IMPORT = ("pandas", "sklearn", "joblib", "scipy")
+
+IMPORT_PROBE = """
+import json, sys, time
+t0 = time.perf_counter()
+import app.main
+dt = time.perf_counter() - t0
+heavy = sorted({m.split(".")[0] for m in sys.modules} & set(%r))
+print(json.dumps({"import_s": dt, "heavy_modules": heavy}))
+""" % (FORBIDDEN_AT_IMPORT,)
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def server_log():
+    """
+    Unnamed temp file for a server's stderr. A pipe nobody drains would fill up
+    on a chatty server and block it mid-run; the file is only read on failure.
+    """
+    return tempfile.TemporaryFile()
+
+
+def read_log(log) -> str:
+    log.seek(0)
+    return log.read().decode(errors="replace")
+
+
+def measure_import(env: dict) -> dict:
+    out = subprocess.run(
+        [sys.executable, "-c", IMPORT_PROBE],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True,
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def measure_startup(env: dict, timeout: float) -> dict:
+    port = free_port()
+    base = f"http://127.0.0.1:{port}"
+    target = (datetime.now() + timedelta(hours=3)).replace(minute=0, second=0, microsecond=0)
+
+    log = server_log()
+    t0 = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=log,
+    )
+    try:
+        with httpx.Client(timeout=5.0) as client:
+            healthy = None
+            while healthy is None:
+                if time.perf_counter() - t0 > timeout:
+                    raise TimeoutError(f"No healthy response within {timeout}s")
+                if proc.poll() is not None:
+                    raise RuntimeError(f"Server exited: {read_log(log)}")
+                try:
+                    if client.get(base + "/health").status_code == 200:
+                        healthy = time.perf_counter() - t0
+                except httpx.TransportError:
+                    time.sleep(0.01)
+
+            r = client.post(base + "/predict", json={"target_datetime": target.isoformat()})
+            r.raise_for_status()
+            first_predict = time.perf_counter() - t0
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+        log.close()
+
+    return {"first_healthy_s": healthy, "first_predict_s": first_predict}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--budget", type=Path, default=BUDGET_PATH)
+    parser.add_argument("--write-budget", action="store_true",
+                        help="store the measured medians (plus --headroom) as the new budget")
+    parser.add_argument("--headroom", type=float, default=0.5,
+                        help="fractional slack added when writing a budget")
+    parser.add_argument("--out", type=Path, help="write the report JSON here as well")
+    args = parser.parse_args()
+
+    with WeatherStub() as stub:
+        env = dict(os.environ, TAXI_WEATHER_URL=stub.url, PYTHONPATH=str(BACKEND_DIR))
+
+        imports = [measure_import(env) for _ in range(args.runs)]
+        runs = [measure_startup(env, args.timeout) for _ in range(args.runs)]
+
+    report = {
+        "runs": args.runs,
+        "model_format": os.environ.get("TAXI_MODEL_FORMAT", "joblib"),
+        "import_s": statistics.median(r["import_s"] for r in imports),
+        "heavy_modules_at_import": imports[0]["heavy_modules"],
+        "first_healthy_s": statistics.median(r["first_healthy_s"] for r in runs),
+        "first_predict_s": statistics.median(r["first_predict_s"] for r in runs),
+        "samples": runs,
+    }
+    print(json.dumps(report, indent=2))
+    if args.out:
+        args.out.write_text(json.dumps(report, indent=2), encoding="utf-8")
+
+    if args.write_budget:
+        budget = {k: round(report[k] * (1 + args.headroom), 3) for k in ("import_s", "first_healthy_s", "first_predict_s")}
+        args.budget.write_text(json.dumps(budget, indent=2) + "\n", encoding="utf-8")
+        print(f"Budget written to {args.budget}")
+        return
+
+    failures = []
+    if report["heavy_modules_at_import"]:
+        failures.append(f"app.main imports {report['heavy_modules_at_import']}")
+    if args.budget.exists():
+        budget = json.loads(args.budget.read_text(encoding="utf-8"))
+        for key, limit in budget.items():
+            if report.get(key, 0.0) > limit:
+                failures.append(f"{key} {report[key]:.3f}s > budget {limit:.3f}s")
+    for f in failures:
+        print(f"REGRESSION: {f}", file=sys.stderr)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Random forest trained on synthetic hourly demand, with the features (and
+order) of a feature_schema.json, so benchmarks exercise a model of realistic
+size without the training data.
+
+    python -m bench.synthetic_model --out /tmp/bench_model
+"""
+import argparse
+import json
+import time
+from pathlib import Path
+
+import numpy as np
+
+from app.services.feature_builder import build_feature_matrix
+from app.services.weather_open_meteo import WeatherBlock
+
+SCHEMA_PATH = Path(__file__).resolve().parent.parent / "artifacts" / "feature_schema.json"
+
+# same shape as train_rf.py
+N_ESTIMATORS = 500
+MIN_SAMPLES_LEAF = 2
+TRAIN_ROWS = 14000
+
+
+def synthetic_frame(features, rows: int, seed: int = 0):
+    """(X, y) for `rows` consecutive hours from 2009-01-01 with a daily/weekly demand cycle."""
+    rng = np.random.default_rng(seed)
+    hours = np.datetime64("2009-01-01T00", "h") + np.arange(rows)
+    start = int(hours[0].astype(np.int64))
+
+    weather = WeatherBlock(start, **{
+        "temp": 12 + 10 * np.sin(2 * np.pi * np.arange(rows) / (24 * 365)) + rng.normal(0, 3, rows),
+        "rhum": rng.uniform(30, 95, rows),
+        "prcp": np.where(rng.random(rows) < 0.1, rng.exponential(1.0, rows), 0.0),
+        "wspd": rng.gamma(2.0, 2.0, rows),
+        "pres": rng.normal(1013, 8, rows),
+    })
+
+    hour = (hours - hours.astype("datetime64[D]")).astype(np.int64)
+    dow = (hours.astype("datetime64[D]").astype(np.int64) + 3) % 7
+    y = (
+        40
+        + 25 * np.sin(2 * np.pi * (hour - 9) / 24)
+        + np.where(dow >= 5, -8.0, 4.0)
+        - 3 * weather.prcp
+        + 0.3 * weather.temp
+        + rng.normal(0, 5, rows)
+    ).clip(0)
+
+    lag_1 = np.concatenate([[y[0]], y[:-1]])
+    lag_24 = np.concatenate([np.full(24, y[0]), y[:-24]])
+    roll = np.convolve(np.concatenate([np.full(24, y[0]), y]), np.ones(24) / 24, mode="valid")[:rows]
+    lags = {"lag_1": lag_1, "lag_24": lag_24, "roll_24_mean": roll}
+
+    X = build_feature_matrix(hours, weather, lags, features)
+    return X, y
+
+
+def build(out_dir: Path, schema_path: Path = SCHEMA_PATH, n_estimators: int = N_ESTIMATORS,
+          rows: int = TRAIN_ROWS, flat: bool = False) -> dict:
+    """Train and write rf_model.joblib + feature_schema.json (+ rf_model_flat) into out_dir."""
+    import joblib
+    from sklearn.ensemble import RandomForestRegressor
+
+    out_dir.mkdir(parents=True, exist_ok=True)
+    features = json.loads(schema_path.read_text(encoding="utf-8"))["features"]
+    X, y = synthetic_frame(features, rows)
+
+    t0 = time.perf_counter()
+    model = RandomForestRegressor(
+        n_estimators=n_estimators,
+        min_samples_leaf=MIN_SAMPLES_LEAF,
+        random_state=42,
+        n_jobs=-1,
+    ).fit(X, y)
+    fit_seconds = time.perf_counter() - t0
+
+    paths = {
+        "model_path": str(out_dir / "rf_model.joblib"),
+        "schema_path": str(out_dir / "feature_schema.json"),
+    }
+    joblib.dump(model, paths["model_path"])
+    (out_dir / "feature_schema.json").write_text(json.dumps({"features": features}, indent=2), encoding="utf-8")
+    if flat:
+        from app.services.compiled_forest import CompiledForest
+        paths["flat_path"] = str(out_dir / "rf_model_flat")
+        CompiledForest.from_model(model).save(paths["flat_path"], features)
+
+    return {
+        **paths,
+        "n_estimators": n_estimators,
+        "train_rows": rows,
+        "n_nodes": int(sum(t.tree_.node_count for t in model.estimators_)),
+        "fit_seconds": round(fit_seconds, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--out", type=Path, required=True)
+    parser.add_argument("--schema", type=Path, default=SCHEMA_PATH)
+    parser.add_argument("--trees", type=int, default=N_ESTIMATORS)
+    parser.add_argument("--rows", type=int, default=TRAIN_ROWS)
+    parser.add_argument("--flat", action="store_true", help="also export the memory-mappable flat model")
+    args = parser.parse_args()
+    print(json.dumps(build(args.out, args.schema, args.trees, args.rows, args.flat), indent=2))
+
+
+if __name__ == "__main__":
+    main()
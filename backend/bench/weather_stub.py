@@ -0,0 +1,111 @@
+"""
+Local stand-in for the Open-Meteo forecast endpoint, so benchmarks don't
+depend on (or hammer) the real API.
+
+    python -m bench.weather_stub --port 8765
+    TAXI_WEATHER_URL=http://127.0.0.1:8765/v1/forecast uvicorn app.main:app
+"""
+import argparse
+import json
+import math
+import threading
+import time
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+def hourly_payload(start: date, end: date) -> dict:
+    times = []
+    d = start
+    while d <= end:
+        times += [f"{d.isoformat()}T{h:02d}:00" for h in range(24)]
+        d += timedelta(days=1)
+    n = len(times)
+    return {
+        "hourly": {
+            "time": times,
+            "temperature_2m": [round(10 + 8 * math.sin(2 * math.pi * (i % 24) / 24), 1) for i in range(n)],
+            "relativehumidity_2m": [60.0] * n,
+            "precipitation": [0.2 if i % 24 in (7, 8) else 0.0 for i in range(n)],
+            "windspeed_10m": [3.5] * n,
+            "pressure_msl": [1013.0] * n,
+        }
+    }
+
+
+class WeatherStub:
+    """Threaded HTTP server answering /v1/forecast; latency_ms simulates the upstream round trip."""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency_ms: float = 0.0):
+        self.latency_ms = latency_ms
+        self.requests = 0
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                url = urlparse(self.path)
+                q = parse_qs(url.query)
+                try:
+                    start = date.fromisoformat(q["start_date"][0])
+                    end = date.fromisoformat(q["end_date"][0])
+                except (KeyError, ValueError):
+                    self.send_error(400, "start_date and end_date are required")
+                    return
+                stub.requests += 1
+                if stub.latency_ms > 0:
+                    time.sleep(stub.latency_ms / 1000.0)
+                body = json.dumps(hourly_payload(start, end)).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/v1/forecast"
+
+    def start(self) -> "WeatherStub":
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    args = parser.parse_args()
+
+    stub = WeatherStub(args.host, args.port, args.latency_ms)
+    print(f"Serving fake Open-Meteo at {stub.url}")
+    try:
+        stub.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stub.server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+"""
+Backtest recursive forecasts over many origins: for every origin hour, forecast
+the next --horizon hours recursively (predictions fed back as lags, exactly as
+the API does) and score each horizon step against the actual rides_count.
+
+    python backtest.py                          # origins over the test part (last 20%)
+    python backtest.py --horizon 168 --stride 6 --model-format flat
+
+Origins advance in lockstep (recursive_forecast_multi: one batched predict per
+horizon step for a whole block of origins), and blocks are spread over worker
+processes. Lags are seeded from the 24 actual hours before each origin;
+weather and calendar features are the observed values from the dataset, so
+the error is that of the model and the recursion, not of a weather forecast.
+Origins whose window has missing hours or missing weather are skipped.
+
+Writes artifacts/backtest_report.json and artifacts/backtest_horizon.csv
+(per-horizon MAE / RMSE).
+"""
+import argparse
+import json
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+# backend/ on the path so the recursion is the API's own
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from app.services.feature_builder import feature_layout  # noqa: E402
+from app.services.model_store import ModelStore  # noqa: E402
+from app.services.recursive_forecast import LAG_WINDOW, recursive_forecast_multi  # noqa: E402
+from dataset import load_columns  # noqa: E402
+from train_rf import split_cores  # noqa: E402
+
+
+DATA_PATH = "hourly_demand_features.csv"
+ARTIFACTS_DIR = Path("artifacts")
+SCHEMA_PATH = ARTIFACTS_DIR / "feature_schema.json"
+MODEL_PATHS = {"joblib": ARTIFACTS_DIR / "rf_model.joblib", "flat": ARTIFACTS_DIR / "rf_model_flat"}
+TARGET = "rides_count"
+
+HORIZON = 24
+BLOCK = 512
+TEST_FRACTION = 0.2  # same tail train_rf.py holds out
+
+
+def valid_origins(hours: np.ndarray, X: np.ndarray, lag_cols: List[int], horizon: int) -> np.ndarray:
+    """
+    Row indices i usable as origins (i = first forecast hour): rows
+    i - LAG_WINDOW .. i + horizon - 1 are consecutive hours, and the forecast
+    rows have every non-lag feature.
+    """
+    n = len(hours)
+    span = LAG_WINDOW + horizon
+    if n < span:
+        return np.empty(0, dtype=np.int64)
+    h = hours.astype("datetime64[h]").astype(np.int64)
+    first = np.arange(LAG_WINDOW, n - horizon + 1)
+    contiguous = h[first + horizon - 1] - h[first - LAG_WINDOW] == span - 1
+
+    other = [j for j in range(X.shape[1]) if j not in lag_cols]
+    bad = np.isnan(X[:, other]).any(axis=1) if other else np.zeros(n, dtype=bool)
+    bad_before = np.concatenate([[0], np.cumsum(bad)])
+    complete = bad_before[first + horizon] - bad_before[first] == 0
+    return first[contiguous & complete]
+
+
+def _fmt_hour(h: np.datetime64) -> str:
+    return str(h.astype("datetime64[s]")).replace("T", " ")
+
+
+# Worker state: the model and dataset columns, both memory-mapped where the
+# format allows, loaded once per process by the pool initializer
+_STATE: Dict[str, object] = {}
+
+
+def _init_worker(model_path: str, schema_path: str, model_format: str, data_path: str, n_jobs: int) -> None:
+    store = ModelStore(model_path, schema_path, model_format=model_format)
+    model = store.current()
+    if model.model is None and model.compiled is None:
+        raise FileNotFoundError(f"Model artifact not found: {model_path}")
+    if model.model is not None:
+        # the forest was saved with n_jobs=-1: every worker would use all cores
+        model.model.n_jobs = n_jobs
+    cols = load_columns(data_path)
+    _STATE["model"] = model
+    _STATE["X"] = np.column_stack([np.asarray(cols[f], dtype=np.float64) for f in model.features])
+    _STATE["y"] = np.asarray(cols[TARGET], dtype=np.float64)
+
+
+def _score_block(origins: np.ndarray, horizon: int) -> Dict[str, np.ndarray]:
+    """Per-horizon error sums over one block of origins."""
+    X, y, model = _STATE["X"], _STATE["y"], _STATE["model"]
+    steps = np.arange(horizon)
+    rows = steps[:, None] + origins[None, :]  # (horizon, n) hour-major, as recursive_forecast_multi wants
+    seeds = y[origins[:, None] + np.arange(-LAG_WINDOW, 0)[None, :]]
+
+    pred = recursive_forecast_multi(model, X[rows], seeds)  # (n, horizon)
+    err = pred - y[rows].T
+    return {
+        "abs": np.abs(err).sum(axis=0),
+        "sq": (err ** 2).sum(axis=0),
+        "bias": err.sum(axis=0),
+        "n": len(origins),
+    }
+
+
+def backtest(
+    model_path: str,
+    schema_path: str,
+    model_format: str,
+    data_path: str,
+    horizon: int,
+    start: Optional[str],
+    end: Optional[str],
+    stride: int,
+    block: int,
+    workers: Optional[int],
+) -> dict:
+    cols = load_columns(data_path)
+    hours = cols["hour"]
+    features = json.loads(Path(schema_path).read_text(encoding="utf-8"))["features"]
+    lag_cols = [j for _, j in feature_layout(features).lags]
+    X = np.column_stack([cols[f] for f in features])
+
+    origins = valid_origins(hours, X, lag_cols, horizon)
+    if start is None:
+        start_h = hours[int(len(hours) * (1 - TEST_FRACTION))]
+    else:
+        start_h = np.datetime64(start)
+    origins = origins[hours[origins] >= start_h]
+    if end is not None:
+        origins = origins[hours[origins] < np.datetime64(end)]
+    origins = origins[::stride]
+    if len(origins) == 0:
+        raise ValueError("No usable forecast origins in the requested range.")
+
+    blocks = [origins[i:i + block] for i in range(0, len(origins), block)]
+    n_workers, n_jobs = split_cores(len(blocks), workers)
+    print(f"Backtest: {len(origins)} origins x {horizon}h in {len(blocks)} blocks, "
+          f"{n_workers} processes x n_jobs={n_jobs}")
+
+    t0 = time.perf_counter()
+    totals = {"abs": np.zeros(horizon), "sq": np.zeros(horizon), "bias": np.zeros(horizon), "n": 0}
+    with ProcessPoolExecutor(
+        n_workers,
+        initializer=_init_worker,
+        initargs=(model_path, schema_path, model_format, data_path, n_jobs),
+    ) as pool:
+        for part in pool.map(_score_block, blocks, [horizon] * len(blocks)):
+            for k in totals:
+                totals[k] = totals[k] + part[k]
+    elapsed = time.perf_counter() - t0
+
+    n = totals["n"]
+    per_horizon = [
+        {
+            "horizon": h + 1,
+            "mae": float(totals["abs"][h] / n),
+            "rmse": float(np.sqrt(totals["sq"][h] / n)),
+            "bias": float(totals["bias"][h] / n),
+        }
+        for h in range(horizon)
+    ]
+    return {
+        "model_path": model_path,
+        "model_format": model_format,
+        "horizon": horizon,
+        "n_origins": int(n),
+        "origin_range": [_fmt_hour(hours[origins[0]]), _fmt_hour(hours[origins[-1]])],
+        "stride": stride,
+        "workers": n_workers,
+        "n_jobs_per_forest": n_jobs,
+        "elapsed_s": round(elapsed, 2),
+        "predict_rows_per_s": round(n * horizon / elapsed, 1),
+        "mae": float(totals["abs"].sum() / (n * horizon)),
+        "rmse": float(np.sqrt(totals["sq"].sum() / (n * horizon))),
+        "per_horizon": per_horizon,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--horizon", type=int, default=HORIZON)
+    parser.add_argument("--start", help="first origin hour (default: start of the last 20%% of rows)")
+    parser.add_argument("--end", help="origins before this hour")
+    parser.add_argument("--stride", type=int, default=1, help="take every n-th usable origin")
+    parser.add_argument("--model-format", choices=sorted(MODEL_PATHS), default="joblib")
+    parser.add_argument("--model", help="model path (default: artifacts/rf_model.joblib or artifacts/rf_model_flat)")
+    parser.add_argument("--block", type=int, default=BLOCK, help="origins per batched recursion")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: one per CPU)")
+    args = parser.parse_args()
+
+    model_path = args.model or str(MODEL_PATHS[args.model_format])
+    report = backtest(
+        model_path, str(SCHEMA_PATH), args.model_format, DATA_PATH,
+        args.horizon, args.start, args.end, args.stride, args.block, args.workers,
+    )
+
+    ARTIFACTS_DIR.mkdir(exist_ok=True)
+    (ARTIFACTS_DIR / "backtest_report.json").write_text(json.dumps(report, indent=2), encoding="utf-8")
+    lines = ["horizon,mae,rmse,bias"] + [
+        f"{r['horizon']},{r['mae']:.6f},{r['rmse']:.6f},{r['bias']:.6f}" for r in report["per_horizon"]
+    ]
+    (ARTIFACTS_DIR / "backtest_horizon.csv").write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+    print(f"{report['n_origins']} origins, {report['origin_range'][0]} -> {report['origin_range'][1]}, "
+          f"{report['elapsed_s']}s ({report['predict_rows_per_s']} rows/s)")
+    print("Overall MAE:", round(report["mae"], 4), "RMSE:", round(report["rmse"], 4))
+    print("\n h    MAE       RMSE")
+    for r in report["per_horizon"]:
+        print(f"{r['horizon']:>3}  {r['mae']:>8.3f}  {r['rmse']:>8.3f}")
+
+    print("\nSaved:")
+    print(" - artifacts/backtest_report.json")
+    print(" - artifacts/backtest_horizon.csv")
+
+
+if __name__ == "__main__":
+    main()
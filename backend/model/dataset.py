@@ -0,0 +1,143 @@
+"""
+Shared loader for hourly_demand_features.csv.
+
+The CSV is parsed once into a column cache next to it
+(hourly_demand_features.cols/: one .npy per column plus meta.json), with the
+hour column as naive datetime64 (parsed as utc then tz removed) and rows
+sorted by hour. Later loads memory-map the .npy files, so no parsing and no
+copies; the cache is rebuilt whenever the CSV's size or mtime changes.
+
+    from dataset import load_frame
+    df = load_frame()          # DataFrame indexed by hour
+
+    python dataset.py          # build / refresh the cache and print a summary
+"""
+import json
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+
+DATA_PATH = "hourly_demand_features.csv"
+TIME_COL = "hour"
+CACHE_VERSION = 1
+
+
+def cache_dir(source) -> Path:
+    source = Path(source)
+    return source.with_name(source.stem + ".cols")
+
+
+def _source_stamp(source: Path) -> dict:
+    st = source.stat()
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+
+def read_meta(cache: Path) -> Optional[dict]:
+    try:
+        return json.loads((cache / "meta.json").read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+
+
+def is_fresh(source, cache: Optional[Path] = None) -> bool:
+    source = Path(source)
+    meta = read_meta(cache or cache_dir(source))
+    return (
+        meta is not None
+        and meta.get("version") == CACHE_VERSION
+        and meta.get("source") == _source_stamp(source)
+    )
+
+
+def _save(path: Path, values: np.ndarray) -> None:
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "wb") as f:
+        np.save(f, values)
+    # replace, not overwrite: readers that still map the old file keep a valid view
+    os.replace(tmp, path)
+
+
+def build_cache(source, cache: Optional[Path] = None) -> dict:
+    """Parse the CSV and write the column cache; returns its meta."""
+    source = Path(source)
+    cache = cache or cache_dir(source)
+    stamp = _source_stamp(source)
+    t0 = time.perf_counter()
+
+    df = pd.read_csv(source)
+    df[TIME_COL] = pd.to_datetime(df[TIME_COL], utc=True).dt.tz_convert(None)
+    df = df.sort_values(TIME_COL, kind="stable").reset_index(drop=True)
+
+    columns = {}
+    for col in df.columns:
+        values = df[col].to_numpy()
+        if col != TIME_COL and values.dtype.kind not in "biuf":
+            raise ValueError(f"Column {col!r} in {source} is not numeric ({values.dtype}).")
+        columns[col] = np.ascontiguousarray(values)
+
+    cache.mkdir(parents=True, exist_ok=True)
+    # meta.json goes last: a cache without it (interrupted build) is never fresh
+    (cache / "meta.json").unlink(missing_ok=True)
+    for col, values in columns.items():
+        _save(cache / f"{col}.npy", values)
+
+    meta = {
+        "version": CACHE_VERSION,
+        "source": stamp,
+        "rows": int(len(df)),
+        "columns": {col: str(values.dtype) for col, values in columns.items()},
+        "parse_s": round(time.perf_counter() - t0, 3),
+    }
+    tmp = cache / "meta.json.tmp"
+    tmp.write_text(json.dumps(meta, indent=2), encoding="utf-8")
+    os.replace(tmp, cache / "meta.json")
+    return meta
+
+
+def load_columns(source=DATA_PATH, mmap: bool = True) -> Dict[str, np.ndarray]:
+    """
+    All columns as numpy arrays (read-only memory maps by default), rows sorted
+    by hour. Builds or refreshes the cache first if the CSV changed.
+    """
+    source = Path(source)
+    cache = cache_dir(source)
+    if not is_fresh(source, cache):
+        build_cache(source, cache)
+    meta = read_meta(cache)
+    mode = "r" if mmap else None
+    # plain ndarray views of the maps (np.memmap subclasses leak into pandas otherwise)
+    return {col: np.asarray(np.load(cache / f"{col}.npy", mmap_mode=mode)) for col in meta["columns"]}
+
+
+def load_frame(source=DATA_PATH, mmap: bool = True):
+    """DataFrame indexed by hour (naive, sorted), sharing memory with the cache."""
+    cols = load_columns(source, mmap)
+    index = pd.DatetimeIndex(cols.pop(TIME_COL), name=TIME_COL, copy=False)
+    df = pd.DataFrame(cols, copy=False)
+    df.index = index
+    return df
+
+
+def main():
+    source = Path(sys.argv[1] if len(sys.argv) > 1 else DATA_PATH)
+    cache = cache_dir(source)
+    if is_fresh(source, cache):
+        print("Cache is fresh:", cache)
+    else:
+        meta = build_cache(source, cache)
+        print(f"Built {cache} from {source} in {meta['parse_s']}s")
+
+    t0 = time.perf_counter()
+    df = load_frame(source)
+    print(f"Loaded rows={len(df)} columns={len(df.columns)} in {time.perf_counter() - t0:.4f}s")
+    print("Time range:", df.index.min(), "->", df.index.max())
+
+
+if __name__ == "__main__":
+    main()
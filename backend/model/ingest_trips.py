@@ -0,0 +1,254 @@
+"""
+Build hourly_demand_features.csv from raw taxi trip files.
+
+    python ingest_trips.py --weather weather_hourly.csv trips/yellow_tripdata_2009-*.csv
+    python ingest_trips.py --weather weather_hourly.csv --append trips/yellow_tripdata_2011-01.parquet
+
+Trip files (CSV, optionally .gz, or Parquet if pyarrow is installed) are read
+in chunks of only the pickup column, so memory is bounded by --chunk-rows, not
+by file size. Each file is binned into hourly pickup counts in its own worker
+process; the per-file counts are summed, hours without pickups become 0, and
+weather is joined by hour.
+
+The weather CSV has an hour column (time / hour) plus temp, rhum, prcp, wspd,
+pres (Meteostat hourly export names) on the same local clock as the trips.
+Hours without weather keep NaN weather and are dropped by the training scripts.
+
+lag_1, lag_24 and roll_24_mean only look at earlier hours (roll_24_mean is the
+mean of the 24 hours before). With --append, new hours are added after the
+existing file and its last 24 counts seed the lags, so earlier rows are never
+recomputed. An --append --start that would leave a gap after the file's last
+hour is refused.
+"""
+import argparse
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+# backend/ on the path so calendar features match the API exactly
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from app.services.feature_builder import CALENDAR_FEATURES, build_feature_matrix  # noqa: E402
+from app.services.recursive_forecast import LAG_WINDOW  # noqa: E402
+from app.services.weather_open_meteo import WEATHER_FIELDS, WeatherBlock  # noqa: E402
+
+
+OUT_PATH = "hourly_demand_features.csv"
+TARGET = "rides_count"
+COLUMNS = ["hour", TARGET, *WEATHER_FIELDS, *CALENDAR_FEATURES, "lag_1", "lag_24", "roll_24_mean"]
+
+# Pickup timestamp column across TLC schema generations (2009, 2010, 2011+, green)
+PICKUP_COLUMNS = (
+    "tpep_pickup_datetime", "lpep_pickup_datetime", "pickup_datetime",
+    "Trip_Pickup_DateTime", "Pickup_DateTime",
+)
+CHUNK_ROWS = 1_000_000
+UTC_OFFSET = r"(?:Z|[+-]\d{2}:?\d{2})$"
+
+
+def parse_local(raw: pd.Series, errors: str = "raise") -> pd.Series:
+    """
+    Naive timestamps on their own wall clock: a UTC offset is dropped, not
+    applied, so trips and weather stay on one local clock (also across DST,
+    where a file mixes offsets).
+    """
+    if pd.api.types.is_string_dtype(raw):
+        raw = raw.str.strip().str.replace(UTC_OFFSET, "", regex=True)
+    ts = pd.to_datetime(raw, errors=errors)
+    if getattr(ts.dt, "tz", None) is not None:
+        ts = ts.dt.tz_localize(None)
+    return ts
+
+
+def pickup_column(columns, wanted: Optional[str]) -> str:
+    if wanted:
+        if wanted not in columns:
+            raise ValueError(f"Column {wanted!r} not found, have {list(columns)}")
+        return wanted
+    stripped = {c.strip(): c for c in columns}
+    for name in PICKUP_COLUMNS:
+        if name in stripped:
+            return stripped[name]
+    raise ValueError(f"No pickup datetime column among {list(columns)}; pass --pickup-col")
+
+
+def iter_pickups(path: Path, column: Optional[str], chunk_rows: int) -> Iterator[pd.Series]:
+    """Pickup timestamps of one trip file, chunk by chunk (raw strings or datetimes)."""
+    if path.suffix == ".parquet":
+        import pyarrow.parquet as pq  # optional, only needed for Parquet input
+
+        pf = pq.ParquetFile(path)
+        col = pickup_column(pf.schema_arrow.names, column)
+        for batch in pf.iter_batches(columns=[col], batch_size=chunk_rows):
+            yield batch.column(0).to_pandas()
+        return
+
+    header = pd.read_csv(path, nrows=0)
+    col = pickup_column(header.columns, column)
+    for chunk in pd.read_csv(path, usecols=[col], chunksize=chunk_rows, dtype=str):
+        yield chunk[col]
+
+
+def hourly_counts(path: str, column: Optional[str] = None, chunk_rows: int = CHUNK_ROWS) -> Tuple[np.ndarray, np.ndarray, int]:
+    """
+    Worker job: (epoch hours, pickup counts, unparseable rows) for one file.
+    Counts are merged per chunk, so the result is at most one entry per hour.
+    """
+    totals: Dict[int, int] = {}
+    bad = 0
+    for raw in iter_pickups(Path(path), column, chunk_rows):
+        ts = parse_local(raw, errors="coerce")
+        valid = ts.notna().to_numpy()
+        bad += int((~valid).sum())
+        hours = ts.to_numpy()[valid].astype("datetime64[h]").astype(np.int64)
+        uniq, counts = np.unique(hours, return_counts=True)
+        for h, c in zip(uniq.tolist(), counts.tolist()):
+            totals[h] = totals.get(h, 0) + c
+    keys = np.fromiter(totals.keys(), dtype=np.int64, count=len(totals))
+    vals = np.fromiter(totals.values(), dtype=np.int64, count=len(totals))
+    order = np.argsort(keys)
+    return keys[order], vals[order], bad
+
+
+def merge_counts(parts: List[Tuple[np.ndarray, np.ndarray]], start: Optional[int], end: Optional[int]) -> Tuple[int, np.ndarray]:
+    """Sum per-file counts into one dense hourly series over [start, end); returns (first hour, counts)."""
+    parts = [(h, c) for h, c in parts if len(h)]
+    if not parts:
+        raise ValueError("No pickups found in the input files.")
+    lo = min(int(h[0]) for h, _ in parts) if start is None else start
+    hi = max(int(h[-1]) for h, _ in parts) + 1 if end is None else end
+    if hi <= lo:
+        raise ValueError("No hours left to write (nothing after --start / the appended file's end).")
+    series = np.zeros(hi - lo, dtype=np.int64)
+    for hours, counts in parts:
+        keep = (hours >= lo) & (hours < hi)
+        np.add.at(series, hours[keep] - lo, counts[keep])
+    return lo, series
+
+
+def lag_columns(counts: np.ndarray, history: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    lag_1, lag_24 and roll_24_mean for counts, continuing after `history`
+    (earlier counts, oldest first, may be empty). Hours without 24 earlier
+    values get NaN. Running sums over integer counts are exact.
+    """
+    y = np.concatenate([history.astype(np.float64), counts.astype(np.float64)])
+    n_hist, n = len(history), len(counts)
+    idx = np.arange(n_hist, n_hist + n)
+
+    def shifted(k: int) -> np.ndarray:
+        out = np.full(n, np.nan)
+        ok = idx - k >= 0
+        out[ok] = y[idx[ok] - k]
+        return out
+
+    csum = np.concatenate([[0.0], np.cumsum(y)])
+    roll = np.full(n, np.nan)
+    ok = idx - LAG_WINDOW >= 0
+    roll[ok] = (csum[idx[ok]] - csum[idx[ok] - LAG_WINDOW]) / LAG_WINDOW
+    return {"lag_1": shifted(1), "lag_24": shifted(LAG_WINDOW), "roll_24_mean": roll}
+
+
+def load_weather(path: str, start: int, n: int) -> WeatherBlock:
+    """Weather CSV -> WeatherBlock over epoch hours [start, start + n); missing hours are NaN."""
+    df = pd.read_csv(path)
+    time_col = "time" if "time" in df.columns else "hour"
+    missing = [c for c in (time_col, *WEATHER_FIELDS) if c not in df.columns]
+    if missing:
+        raise ValueError(f"Weather file {path} lacks columns {missing}")
+    ts = parse_local(df[time_col])
+    hours = ts.to_numpy().astype("datetime64[h]").astype(np.int64) - start
+    keep = (hours >= 0) & (hours < n)
+    block = WeatherBlock.empty(start, n)
+    for f in WEATHER_FIELDS:
+        block.column(f)[hours[keep]] = df[f].to_numpy(dtype=np.float64)[keep]
+    return block
+
+
+def read_history(out_path: Path) -> Tuple[Optional[int], np.ndarray]:
+    """(next epoch hour, last LAG_WINDOW counts) of an existing feature file."""
+    if not out_path.exists():
+        return None, np.empty(0)
+    tail = pd.read_csv(out_path, usecols=["hour", TARGET]).tail(LAG_WINDOW)
+    if tail.empty:
+        return None, np.empty(0)
+    last = parse_local(tail["hour"]).iloc[-1]
+    return int(np.datetime64(last, "h").astype(np.int64)) + 1, tail[TARGET].to_numpy(dtype=np.float64)
+
+
+def build_frame(start: int, counts: np.ndarray, weather: WeatherBlock, history: np.ndarray) -> pd.DataFrame:
+    hours = np.datetime64(start, "h") + np.arange(len(counts))
+    calendar = build_feature_matrix(hours, weather, None, CALENDAR_FEATURES)
+    frame = {
+        "hour": pd.DatetimeIndex(hours.astype("datetime64[ns]")).strftime("%Y-%m-%d %H:%M:%S"),
+        TARGET: counts,
+        **{f: weather.column(f) for f in WEATHER_FIELDS},
+        **{f: calendar[:, j] for j, f in enumerate(CALENDAR_FEATURES)},
+        **lag_columns(counts, history),
+    }
+    df = pd.DataFrame(frame, columns=COLUMNS)
+    for f in ("hour_of_day", "day_of_week", "month"):
+        df[f] = df[f].astype(np.int64)
+    return df
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("trips", nargs="+", help="raw trip files (.csv, .csv.gz, .parquet)")
+    parser.add_argument("--weather", required=True, help="hourly weather CSV")
+    parser.add_argument("--out", default=OUT_PATH)
+    parser.add_argument("--append", action="store_true",
+                        help="add hours after the end of --out instead of rewriting it")
+    parser.add_argument("--pickup-col", help="pickup datetime column (auto-detected by default)")
+    parser.add_argument("--start", help="first hour to keep, e.g. 2009-01-01 (drops stray timestamps)")
+    parser.add_argument("--end", help="keep hours before this, e.g. 2011-01-01")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: one per CPU)")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    args = parser.parse_args()
+
+    out_path = Path(args.out)
+    start = int(np.datetime64(args.start, "h").astype(np.int64)) if args.start else None
+    end = int(np.datetime64(args.end, "h").astype(np.int64)) if args.end else None
+    history = np.empty(0)
+    if args.append:
+        next_hour, history = read_history(out_path)
+        if next_hour is not None:
+            if start is not None and start > next_hour:
+                # the lags of the new rows would skip the missing hours
+                raise ValueError(
+                    f"--start {args.start} leaves a gap after the last hour of {out_path} "
+                    f"({np.datetime64(next_hour - 1, 'h')}); append the missing hours first or rebuild the file."
+                )
+            start = next_hour if start is None else max(start, next_hour)
+
+    t0 = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        futures = [pool.submit(hourly_counts, p, args.pickup_col, args.chunk_rows) for p in args.trips]
+        parts = []
+        for path, fut in zip(args.trips, futures):
+            hours, counts, bad = fut.result()
+            print(f"{path}: {int(counts.sum())} pickups in {len(hours)} hours, {bad} unparseable")
+            parts.append((hours, counts))
+    print(f"Binned {len(args.trips)} files in {time.perf_counter() - t0:.1f}s")
+
+    first, counts = merge_counts(parts, start, end)
+    weather = load_weather(args.weather, first, len(counts))
+    df = build_frame(first, counts, weather, history)
+
+    no_weather = int(np.isnan(weather.temp).sum())
+    if no_weather:
+        print(f"Warning: {no_weather} hours without weather (NaN, dropped at training time)")
+
+    if args.append and out_path.exists():
+        df.to_csv(out_path, mode="a", header=False, index=False)
+    else:
+        df.to_csv(out_path, index=False)
+    print("Saved", out_path, "rows=", len(df), "range:", df["hour"].iloc[0], "->", df["hour"].iloc[-1])
+
+
+if __name__ == "__main__":
+    main()
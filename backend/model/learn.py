@@ -7,15 +7,10 @@ FEATURES = [
 
 TARGET = "rides_count"
 
-import pandas as pd
+from dataset import load_frame
 
-# === LOAD ===
-df = pd.read_csv("hourly_demand_features.csv")
-
-# === FIX TIME ===
-df["hour"] = pd.to_datetime(df["hour"])
-df = df.sort_values("hour")
-df = df.set_index("hour")
+# === LOAD (sorted, indexed by hour) ===
+df = load_frame("hourly_demand_features.csv")
 
 # === FEATURES & TARGET ===
 FEATURES = [
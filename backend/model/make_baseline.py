@@ -1,13 +1,13 @@
-import pandas as pd
 from pathlib import Path
 
+from dataset import load_frame
+
 DATA_PATH = "hourly_demand_features.csv"
 OUT_PATH = Path("../artifacts/demand_baseline.csv")
 
 OUT_PATH.parent.mkdir(parents=True, exist_ok=True)
 
-df = pd.read_csv(DATA_PATH)
-df["hour"] = pd.to_datetime(df["hour"], utc=True).dt.tz_convert(None)
+df = load_frame(DATA_PATH)
 
 baseline = (
     df.groupby(["month", "day_of_week", "hour_of_day"])["rides_count"]
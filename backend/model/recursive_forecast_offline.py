@@ -6,6 +6,8 @@ import joblib
 import numpy as np
 import pandas as pd
 
+from dataset import load_frame
+
 
 DATA_PATH = "hourly_demand_features.csv"
 MODEL_PATH = "artifacts/rf_model.joblib"
@@ -14,13 +16,8 @@ OUT_PATH = "artifacts/forecast_preview.csv"
 
 
 def load_history():
-    df = pd.read_csv(DATA_PATH)
-
-    # привести час стабільно
-    df["hour"] = pd.to_datetime(df["hour"], utc=True).dt.tz_convert(None)
-    df = df.sort_values("hour").set_index("hour")
-
-    return df
+    # час уже приведений (utc -> naive) і відсортований у кеші колонок
+    return load_frame(DATA_PATH)
 
 
 def get_features_list():
@@ -1,5 +1,12 @@
+import argparse
 import json
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
+from typing import Dict, List, Optional, Tuple
 
 import joblib
 import numpy as np
@@ -7,6 +14,11 @@ import pandas as pd
 from sklearn.ensemble import RandomForestRegressor
 from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
 
+# backend/ on the path so the flat export shares code with the API
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from app.services.compiled_forest import CompiledForest  # noqa: E402
+from dataset import load_frame  # noqa: E402
+
 
 DATA_PATH = "hourly_demand_features.csv"
 ARTIFACTS_DIR = Path("artifacts")
@@ -20,20 +32,178 @@ FEATURES = [
 ]
 TARGET = "rides_count"
 
+PARAMS = {"n_estimators": 500, "max_depth": None, "min_samples_leaf": 2, "max_features": 1.0}
+
+# --tune: every combination is scored on N_FOLDS walk-forward folds of the train part
+PARAM_GRID = {
+    "n_estimators": [300, 500],
+    "max_depth": [None, 20],
+    "min_samples_leaf": [1, 2, 5],
+    "max_features": [1.0, 0.5],
+}
+N_FOLDS = 5
+
 
 def rmse(y_true, y_pred) -> float:
     return float(np.sqrt(mean_squared_error(y_true, y_pred)))
 
 
-def main():
-    # === Load ===
-    df = pd.read_csv(DATA_PATH)
+def dir_size_mb(path: Path) -> float:
+    return sum(f.stat().st_size for f in path.iterdir()) / 1e6
+
+
+def export_flat(model, X_test: pd.DataFrame) -> dict:
+    """
+    Write the forest as memory-mappable node arrays (artifacts/rf_model_flat/)
+    and compare its load time / size against the joblib pickle.
+    """
+    forest = CompiledForest.from_model(model)
+    X_check = X_test.to_numpy(dtype=np.float64)
+    diff = float(np.max(np.abs(forest.predict(X_check) - model.predict(X_test))))
+    if diff > 1e-6:
+        raise RuntimeError(f"Flat export disagrees with model.predict (max diff {diff:.3g})")
+
+    flat_dir = ARTIFACTS_DIR / "rf_model_flat"
+    forest.save(str(flat_dir), FEATURES)
+
+    t0 = time.perf_counter()
+    joblib.load(ARTIFACTS_DIR / "rf_model.joblib")
+    joblib_s = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    CompiledForest.load(str(flat_dir), mmap=True)
+    flat_s = time.perf_counter() - t0
+
+    return {
+        "n_nodes": int(forest.feature.shape[0]),
+        "max_abs_diff_vs_sklearn": diff,
+        "joblib_mb": (ARTIFACTS_DIR / "rf_model.joblib").stat().st_size / 1e6,
+        "flat_mb": dir_size_mb(flat_dir),
+        "joblib_load_s": joblib_s,
+        "flat_mmap_load_s": flat_s,
+    }
+
+
+def walk_forward_folds(n_rows: int, n_folds: int) -> List[Tuple[int, int]]:
+    """
+    Expanding-window folds as (train_end, val_end) row bounds: the rows are cut
+    into n_folds + 1 blocks, fold k trains on blocks 0..k and validates on k+1.
+    """
+    block = n_rows // (n_folds + 1)
+    if block == 0:
+        raise ValueError(f"{n_rows} rows are too few for {n_folds} folds")
+    return [((k + 1) * block, (k + 2) * block if k < n_folds - 1 else n_rows) for k in range(n_folds)]
+
+
+def param_grid(grid: Dict[str, list]) -> List[dict]:
+    combos = [{}]
+    for name, values in grid.items():
+        combos = [{**c, name: v} for c in combos for v in values]
+    return combos
+
+
+def split_cores(n_tasks: int, workers: Optional[int] = None) -> Tuple[int, int]:
+    """(worker processes, n_jobs per forest): processes first, leftover cores go to each forest's trees."""
+    cores = os.cpu_count() or 1
+    workers = max(1, min(workers or cores, n_tasks))
+    return workers, max(1, cores // workers)
 
-    # Fix time column safely (remove timezone warning)
-    df["hour"] = pd.to_datetime(df["hour"], utc=True)
-    df["hour"] = df["hour"].dt.tz_convert(None)
 
-    df = df.sort_values("hour").set_index("hour")
+# Worker-side train matrix: memory-mapped from the .npy files tune() writes, so
+# every process reads the same pages instead of receiving a pickled copy
+_SHARED: Dict[str, np.ndarray] = {}
+
+
+def _init_tuning_worker(x_path: str, y_path: str) -> None:
+    _SHARED["X"] = np.load(x_path, mmap_mode="r")
+    _SHARED["y"] = np.load(y_path, mmap_mode="r")
+
+
+def _score_fold(params: dict, fold: int, train_end: int, val_end: int, n_jobs: int) -> dict:
+    X, y = _SHARED["X"], _SHARED["y"]
+    model = RandomForestRegressor(**params, random_state=42, n_jobs=n_jobs)
+    t0 = time.perf_counter()
+    model.fit(X[:train_end], y[:train_end])
+    fit_s = time.perf_counter() - t0
+    y_val = y[train_end:val_end]
+    y_pred = model.predict(X[train_end:val_end])
+    return {
+        "fold": fold,
+        "mae": float(mean_absolute_error(y_val, y_pred)),
+        "rmse": rmse(y_val, y_pred),
+        "r2": float(r2_score(y_val, y_pred)),
+        "fit_s": round(fit_s, 2),
+    }
+
+
+def tune(X_train: pd.DataFrame, y_train: pd.Series, n_folds: int = N_FOLDS, workers: Optional[int] = None) -> dict:
+    """
+    Score every PARAM_GRID combination on walk-forward folds of the train part
+    (the test part stays untouched), all (combination, fold) fits in a process pool.
+    Returns the per-combination fold metrics, sorted by mean RMSE, and the best params.
+    """
+    folds = walk_forward_folds(len(X_train), n_folds)
+    combos = param_grid(PARAM_GRID)
+    tasks = [(params, k, train_end, val_end) for params in combos for k, (train_end, val_end) in enumerate(folds)]
+    n_workers, n_jobs = split_cores(len(tasks), workers)
+    print(f"\nTuning: {len(combos)} combinations x {n_folds} folds = {len(tasks)} fits, "
+          f"{n_workers} processes x n_jobs={n_jobs}")
+
+    t0 = time.perf_counter()
+    with tempfile.TemporaryDirectory(prefix="train_rf_") as tmp:
+        # float32 C-order is what the trees train on, so the workers' views need no conversion
+        x_path, y_path = os.path.join(tmp, "X.npy"), os.path.join(tmp, "y.npy")
+        np.save(x_path, np.ascontiguousarray(X_train.to_numpy(dtype=np.float32)))
+        np.save(y_path, y_train.to_numpy(dtype=np.float64))
+        with ProcessPoolExecutor(n_workers, initializer=_init_tuning_worker, initargs=(x_path, y_path)) as pool:
+            futures = [pool.submit(_score_fold, params, k, tr, va, n_jobs) for params, k, tr, va in tasks]
+            scores = [f.result() for f in futures]
+    elapsed = time.perf_counter() - t0
+
+    grid = []
+    for i, params in enumerate(combos):
+        fold_scores = scores[i * n_folds:(i + 1) * n_folds]
+        rmses = [s["rmse"] for s in fold_scores]
+        grid.append({
+            "params": params,
+            "mean_mae": float(np.mean([s["mae"] for s in fold_scores])),
+            "mean_rmse": float(np.mean(rmses)),
+            "std_rmse": float(np.std(rmses)),
+            "folds": fold_scores,
+        })
+    grid.sort(key=lambda g: g["mean_rmse"])
+
+    index = X_train.index
+    return {
+        "n_folds": n_folds,
+        "folds": [
+            {
+                "train_range": [str(index[0]), str(index[train_end - 1])],
+                "val_range": [str(index[train_end]), str(index[val_end - 1])],
+                "train_rows": train_end,
+                "val_rows": val_end - train_end,
+            }
+            for train_end, val_end in folds
+        ],
+        "workers": n_workers,
+        "n_jobs_per_forest": n_jobs,
+        "elapsed_s": round(elapsed, 1),
+        "best_params": grid[0]["params"],
+        "grid": grid,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tune", action="store_true",
+                        help="pick hyperparameters by walk-forward CV over PARAM_GRID, then refit the best")
+    parser.add_argument("--folds", type=int, default=N_FOLDS)
+    parser.add_argument("--workers", type=int, default=None, help="tuning processes (default: one per CPU)")
+    args = parser.parse_args()
+
+    # === Load ===
+    # sorted, tz-naive hour index (parsed once into the column cache)
+    df = load_frame(DATA_PATH)
 
     # Drop rows with any missing in required columns
     df = df.dropna(subset=FEATURES + [TARGET])
@@ -63,11 +233,19 @@ def main():
     print("RMSE:", round(baseline_rmse, 4))
     print("R2  :", round(baseline_r2, 4))
 
+    # === Hyperparameters (fixed, or tuned on the train part only) ===
+    params = dict(PARAMS)
+    tuning = None
+    if args.tune:
+        tuning = tune(X_train, y_train, args.folds, args.workers)
+        params = tuning["best_params"]
+        best = tuning["grid"][0]
+        print(f"Best of {len(tuning['grid'])} in {tuning['elapsed_s']}s: {params} "
+              f"(CV RMSE {best['mean_rmse']:.4f} +- {best['std_rmse']:.4f})")
+
     # === Model ===
     model = RandomForestRegressor(
-        n_estimators=500,
-        max_depth=None,
-        min_samples_leaf=2,
+        **params,
         random_state=42,
         n_jobs=-1
     )
@@ -92,6 +270,7 @@ def main():
 
     # === Save artifacts ===
     joblib.dump(model, ARTIFACTS_DIR / "rf_model.joblib")
+    flat = export_flat(model, X_test)
 
     schema = {
         "features": FEATURES,
@@ -103,8 +282,10 @@ def main():
 
     metadata = {
         "model_type": "RandomForestRegressor",
-        "n_estimators": 500,
-        "min_samples_leaf": 2,
+        "n_estimators": params["n_estimators"],
+        "max_depth": params["max_depth"],
+        "min_samples_leaf": params["min_samples_leaf"],
+        "max_features": params["max_features"],
         "random_state": 42,
         "train_rows": int(len(X_train)),
         "test_rows": int(len(X_test)),
@@ -114,14 +295,21 @@ def main():
         },
         "train_time_range": [str(X_train.index.min()), str(X_train.index.max())],
         "test_time_range": [str(X_test.index.min()), str(X_test.index.max())],
+        "flat_export": flat,
     }
+    if tuning is not None:
+        metadata["tuning"] = tuning
     (ARTIFACTS_DIR / "metadata.json").write_text(json.dumps(metadata, indent=2), encoding="utf-8")
 
     print("\nSaved:")
     print(" - artifacts/rf_model.joblib")
+    print(" - artifacts/rf_model_flat/ (model_format=\"flat\", memory-mapped)")
     print(" - artifacts/feature_schema.json")
     print(" - artifacts/metadata.json")
 
+    print("\nFlat export: {n_nodes} nodes, {flat_mb:.1f} MB (joblib {joblib_mb:.1f} MB)".format(**flat))
+    print("Load time: joblib {joblib_load_s:.3f}s, flat mmap {flat_mmap_load_s:.4f}s".format(**flat))
+
     # Feature importance (helpful for report)
     importances = pd.Series(model.feature_importances_, index=FEATURES).sort_values(ascending=False)
     print("\nTop-10 feature importances:")
@@ -0,0 +1,44 @@
+import asyncio
+
+import numpy as np
+
+from app.services.batcher import MicroBatcher
+
+class FakeModel:
+    """Stands in for LoadedModel: predicts the row sum plus an offset per version."""
+
+    def __init__(self, version: str, n_features: int, offset: float):
+        self.version = version
+        self.features = [f"f{i}" for i in range(n_features)]
+        self.offset = offset
+        self.batches = []
+
+    def predict_batch(self, X: np.ndarray) -> np.ndarray:
+        assert X.shape[1] == len(self.features)
+        self.batches.append(len(X))
+        return X.sum(axis=1) + self.offset
+
+def test_rows_are_predicted_by_the_model_they_were_built_for():
+    old, new = FakeModel("v1", 3, 0.0), FakeModel("v2", 5, 1000.0)
+
+    async def run():
+        batcher = MicroBatcher(max_batch=32, max_wait_ms=5.0)
+        # a reload lands mid-batch: old-layout and new-layout rows interleave
+        calls = [
+            (old, np.full(3, 1.0)), (old, np.full(3, 2.0)),
+            (new, np.full(5, 1.0)), (old, np.full(3, 3.0)), (new, np.full(5, 2.0)),
+        ]
+        return await asyncio.gather(*(batcher.predict_row(m, x) for m, x in calls))
+
+    assert asyncio.run(run()) == [3.0, 6.0, 1005.0, 9.0, 1010.0]
+    assert sum(old.batches) == 3 and sum(new.batches) == 2
+
+def test_same_model_rows_share_a_batch():
+    model = FakeModel("v1", 2, 0.0)
+
+    async def run():
+        batcher = MicroBatcher(max_batch=32, max_wait_ms=5.0)
+        return await asyncio.gather(*(batcher.predict_row(model, np.array([i, 0.0])) for i in range(10)))
+
+    assert asyncio.run(run()) == [float(i) for i in range(10)]
+    assert model.batches == [10]
@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestRegressor
+
+from app.services.compiled_forest import CompiledForest
+
+FEATURES = ["temp", "rhum", "prcp", "hour_of_day", "lag_1"]
+
+@pytest.fixture(scope="module")
+def model() -> RandomForestRegressor:
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(600, len(FEATURES)))
+    y = 3 * X[:, 0] - X[:, 1] ** 2 + np.where(X[:, 3] > 0, 5.0, 0.0) + rng.normal(0, 0.3, 600)
+    return RandomForestRegressor(n_estimators=20, min_samples_leaf=2, random_state=42).fit(X, y)
+
+def _rows(n: int, seed: int = 1) -> np.ndarray:
+    return np.random.default_rng(seed).normal(size=(n, len(FEATURES)))
+
+@pytest.mark.parametrize("n_rows", [1, 8, 168])
+def test_predict_matches_sklearn(model, n_rows):
+    forest = CompiledForest.from_model(model)
+    X = _rows(n_rows)
+    assert np.allclose(forest.predict(X), model.predict(X), rtol=0, atol=1e-9)
+
+def test_check_parity(model):
+    assert CompiledForest.from_model(model).check_parity(model) < 1e-9
+
+@pytest.mark.parametrize("mmap", [True, False])
+def test_flat_save_load_round_trip(model, tmp_path, mmap):
+    forest = CompiledForest.from_model(model)
+    forest.save(str(tmp_path / "flat"), FEATURES)
+    # a second save replaces the export in place
+    forest.save(str(tmp_path / "flat"), FEATURES)
+
+    loaded, meta = CompiledForest.load(str(tmp_path / "flat"), mmap=mmap)
+    assert meta["features"] == FEATURES
+    assert meta["n_trees"] == len(model.estimators_)
+    for name in CompiledForest.ARRAYS:
+        assert np.array_equal(getattr(loaded, name), getattr(forest, name))
+    X = _rows(168)
+    assert np.allclose(loaded.predict(X), model.predict(X), rtol=0, atol=1e-9)
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["flat"]
+
+def test_rejects_wrong_width(model):
+    with pytest.raises(ValueError, match="Expected matrix"):
+        CompiledForest.from_model(model).predict(_rows(4)[:, :3])
@@ -0,0 +1,30 @@
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from app.services.feature_builder import build_feature_matrix
+from app.services.weather_open_meteo import WEATHER_FIELDS, WeatherBlock, epoch_hour
+
+FEATURES = ["temp", "rhum", "prcp", "wspd", "pres", "hour_of_day", "day_of_week", "month", "hour_sin", "hour_cos"]
+START = datetime(2026, 3, 1)
+
+def _block(hours: int) -> WeatherBlock:
+    return WeatherBlock(epoch_hour(START), **{f: np.full(hours, 1.0) for f in WEATHER_FIELDS})
+
+@pytest.mark.parametrize("field", WEATHER_FIELDS)
+def test_nan_in_any_weather_column_is_missing_weather(field):
+    block = _block(24)
+    block.column(field)[7] = np.nan
+    hours = np.datetime64(START, "h") + np.arange(24)
+
+    with pytest.raises(ValueError, match="No weather for hour 2026-03-01 07:00"):
+        build_feature_matrix(hours, block, None, FEATURES)
+
+def test_nan_in_unused_weather_column_is_ignored():
+    block = _block(24)
+    block.prcp[7] = np.nan
+    hours = np.datetime64(START, "h") + np.arange(24)
+
+    X = build_feature_matrix(hours, block, None, [f for f in FEATURES if f != "prcp"])
+    assert not np.isnan(X).any()
@@ -0,0 +1,40 @@
+import asyncio
+import threading
+
+from app.services.inference import InferencePool
+
+def _blocking(model, started: threading.Event, release: threading.Event) -> str:
+    started.set()
+    release.wait(5)
+    return model
+
+def test_cancelled_caller_keeps_job_counted_until_it_finishes():
+    async def run():
+        pool = InferencePool(model_store=None, workers=1, queue_depth=0)
+        started, release = threading.Event(), threading.Event()
+        task = asyncio.ensure_future(pool.run(_blocking, "m", started, release))
+        await asyncio.to_thread(started.wait, 5)
+
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        counted_while_running = pool.pending
+
+        release.set()
+        for _ in range(100):
+            if pool.pending == 0:
+                break
+            await asyncio.sleep(0.01)
+        pool.shutdown()
+        return counted_while_running, pool.pending
+
+    assert asyncio.run(run()) == (1, 0)
+
+def test_finished_job_is_released():
+    async def run():
+        pool = InferencePool(model_store=None, workers=1, queue_depth=0)
+        result = await pool.run(lambda model, x: model + x, 1, 2)
+        await asyncio.sleep(0)
+        pool.shutdown()
+        return result, pool.pending
+
+    assert asyncio.run(run()) == (3, 0)
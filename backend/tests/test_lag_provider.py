@@ -0,0 +1,63 @@
+import csv
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from app.services.lag_provider import BaselineLagProvider
+
+BASELINE_PATH = Path(__file__).resolve().parent.parent / "artifacts" / "demand_baseline.csv"
+LAG_KEYS = ("lag_1", "lag_24", "roll_24_mean")
+
+class ReferenceLags:
+    """The original per-hour lookup: 24 mean_for() calls averaged for roll_24_mean."""
+
+    def __init__(self, csv_path: Path):
+        with csv_path.open(newline="", encoding="utf-8") as f:
+            rows = list(csv.DictReader(f))
+        self.base = {
+            (int(r["month"]), int(r["day_of_week"]), int(r["hour_of_day"])): float(r["mean_rides"]) for r in rows
+        }
+        self.global_mean = sum(self.base.values()) / len(self.base)
+
+    def mean_for(self, dt: datetime) -> float:
+        return self.base.get((dt.month, dt.weekday(), dt.hour), self.global_mean)
+
+    def get_lags(self, target_dt: datetime) -> dict:
+        vals = [self.mean_for(target_dt - timedelta(hours=i)) for i in range(1, 25)]
+        return {
+            "lag_1": self.mean_for(target_dt - timedelta(hours=1)),
+            "lag_24": self.mean_for(target_dt - timedelta(hours=24)),
+            "roll_24_mean": sum(vals) / len(vals),
+        }
+
+@pytest.fixture(params=["full", "sparse"])
+def baseline_csv(request, tmp_path) -> Path:
+    if request.param == "full":
+        return BASELINE_PATH
+    # every third cell missing: those hours fall back to the global mean
+    with BASELINE_PATH.open(newline="", encoding="utf-8") as f:
+        rows = list(csv.DictReader(f))
+    path = tmp_path / "sparse_baseline.csv"
+    with path.open("w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows[::3])
+    return path
+
+# a leap year, so month ends, the 1st of every month and Feb 29 are all covered
+HOURS = [datetime(2024, 1, 1) + timedelta(hours=i) for i in range(0, 366 * 24, 5)]
+
+def test_get_lags_matches_reference(baseline_csv):
+    lags, ref = BaselineLagProvider(str(baseline_csv)), ReferenceLags(baseline_csv)
+    for dt in HOURS:
+        got, want = lags.get_lags(dt), ref.get_lags(dt)
+        # roll_24_mean is summed in a different order: equal up to float rounding, not bit for bit
+        assert [got[k] for k in LAG_KEYS] == pytest.approx([want[k] for k in LAG_KEYS], rel=1e-12)
+
+def test_get_lags_batch_matches_reference(baseline_csv):
+    lags, ref = BaselineLagProvider(str(baseline_csv)), ReferenceLags(baseline_csv)
+    batch = lags.get_lags_batch(HOURS)
+    for k in LAG_KEYS:
+        np.testing.assert_allclose(batch[k], [ref.get_lags(dt)[k] for dt in HOURS], rtol=1e-12, atol=0)
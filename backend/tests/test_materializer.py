@@ -0,0 +1,63 @@
+import asyncio
+import json
+from datetime import date, timedelta
+from pathlib import Path
+
+import httpx
+import numpy as np
+import pytest
+
+from app.services.lag_provider import BaselineLagProvider
+from app.services.materializer import ForecastMaterializer
+from app.services.model_store import ModelStore
+from app.services.predictors import forecast_range
+from app.services.weather_open_meteo import WeatherClient
+from bench.synthetic_model import build
+from bench.weather_stub import hourly_payload
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+BASELINE_PATH = BACKEND_DIR / "artifacts" / "demand_baseline.csv"
+LOCATION = {"lat": 40.7128, "lon": -74.0060, "timezone": "America/New_York"}
+HORIZON = 48
+
+def _weather_transport() -> httpx.MockTransport:
+    def handler(request: httpx.Request) -> httpx.Response:
+        q = request.url.params
+        payload = hourly_payload(date.fromisoformat(q["start_date"]), date.fromisoformat(q["end_date"]))
+        return httpx.Response(200, content=json.dumps(payload), headers={"Content-Type": "application/json"})
+    return httpx.MockTransport(handler)
+
+@pytest.fixture(scope="module")
+def model_store(tmp_path_factory) -> ModelStore:
+    info = build(tmp_path_factory.mktemp("model"), n_estimators=5, rows=800)
+    return ModelStore(info["model_path"], info["schema_path"])
+
+def _served(materializer, services, start, hours):
+    """What /forecast returns: the materialized slice if served, else on-demand."""
+    hit = materializer.forecast_slice(start, hours)
+    if hit is not None:
+        return hit
+    return asyncio.run(forecast_range(start_dt=start, hours=hours, **services, **LOCATION))
+
+@pytest.mark.parametrize("offset", [0, 1, 10, 24])
+def test_materialized_slice_matches_on_demand(model_store, offset):
+    weather = WeatherClient(transport=_weather_transport())
+    lags = BaselineLagProvider(str(BASELINE_PATH))
+    services = {"model_store": model_store, "weather_client": weather, "lag_provider": lags}
+    materializer = ForecastMaterializer(
+        model_store, weather, lags,
+        LOCATION["lat"], LOCATION["lon"], LOCATION["timezone"],
+        horizon_hours=HORIZON,
+    )
+    asyncio.run(materializer.refresh())
+    start = materializer._table.origin + timedelta(hours=offset)
+
+    served, served_warnings = _served(materializer, services, start, 24)
+    expected, expected_warnings = asyncio.run(forecast_range(start_dt=start, hours=24, **services, **LOCATION))
+
+    assert (materializer.forecast_slice(start, 24) is not None) == (offset == 0)
+    assert [p["datetime"] for p in served] == [p["datetime"] for p in expected]
+    np.testing.assert_allclose(
+        [p["demand"] for p in served], [p["demand"] for p in expected], rtol=0, atol=1e-9,
+    )
+    assert served_warnings == expected_warnings
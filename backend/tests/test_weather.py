@@ -0,0 +1,52 @@
+import asyncio
+import json
+from datetime import date, datetime, timedelta
+
+import httpx
+import pytest
+
+from app.services.weather_open_meteo import WEATHER_FIELDS, OPEN_METEO_FIELDS, WeatherBlock, WeatherClient
+from bench.weather_stub import hourly_payload
+
+DAY = date(2026, 3, 1)
+
+@pytest.mark.parametrize("field", WEATHER_FIELDS)
+def test_hour_with_any_null_field_is_missing(field):
+    hourly = hourly_payload(DAY, DAY)["hourly"]
+    hourly[OPEN_METEO_FIELDS[field]][5] = None
+    block = WeatherBlock.from_open_meteo(hourly)
+
+    assert block.get(datetime(2026, 3, 1, 5)) is None
+    wp = block.get(datetime(2026, 3, 1, 6))
+    assert wp is not None and all(v == v for v in wp.as_dict().values())
+
+def _client(max_days: int) -> WeatherClient:
+    def handler(request: httpx.Request) -> httpx.Response:
+        q = request.url.params
+        payload = hourly_payload(date.fromisoformat(q["start_date"]), date.fromisoformat(q["end_date"]))
+        return httpx.Response(200, content=json.dumps(payload), headers={"Content-Type": "application/json"})
+    return WeatherClient(max_days=max_days, transport=httpx.MockTransport(handler))
+
+def _fetch(client: WeatherClient, first: date, days: int):
+    end = datetime.combine(first + timedelta(days=days - 1), datetime.min.time())
+    return client.fetch_hourly_map(40.7, -74.0, datetime.combine(first, datetime.min.time()), end, "UTC")
+
+def _complete(block: WeatherBlock, first: date, days: int) -> bool:
+    start = datetime.combine(first, datetime.min.time())
+    return all(block.get(start + timedelta(hours=h)) is not None for h in range(days * 24))
+
+def test_span_over_cache_limit_is_rejected():
+    client = _client(max_days=5)
+    with pytest.raises(ValueError):
+        asyncio.run(_fetch(client, DAY, 8))
+
+def test_concurrent_requests_keep_their_days_until_collected():
+    async def run():
+        client = _client(max_days=5)
+        firsts = [DAY + timedelta(days=4 * i) for i in range(3)]
+        blocks = await asyncio.gather(*(_fetch(client, d, 4) for d in firsts))
+        return client, firsts, blocks
+
+    client, firsts, blocks = asyncio.run(run())
+    assert all(_complete(b, d, 4) for b, d in zip(blocks, firsts))
+    assert client.stats()["days_cached"] <= 5